@@ -0,0 +1,330 @@
+"""Headless benchmarks for the data layer in dataset.py.
+
+For every row shape, dataset size and storage backend this generates a
+synthetic dataset and measures what the unit screens do with it: loading
+(parse and index build, as in load_data), listing headers (as in
+load_headers_list) and query latency percentiles (as in _threaded_search),
+plus peak memory. The "packed" backend is the json one over a gzip-packed
+copy of the file, as kept by DatasetUpdater with compress_cache. Each case runs in a fresh process so its peak RSS is its
+own. Results are written as JSON and can be compared with an earlier run:
+
+    python -m benchmarks.datalayer --rows 10000,100000 --out before.json
+    python -m benchmarks.datalayer --rows 10000,100000 --out after.json --compare before.json
+
+Run it from the repository root; nothing here imports Kivy.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    # Windows: peak RSS is not reported
+    resource = None
+
+from dataset import (
+    IndexedJsonStore, MemoryStore, Query, SqliteStore, build_table_index, dataset_path, pack_dataset,
+)
+from benchmarks.synthetic import write_dataset
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BACKENDS = ["memory", "json", "packed", "sqlite"]
+
+# Lower-cased like the search box: common, rare and missing terms, a term
+# shorter than a trigram, multi-term queries, column filters and ranges
+QUERIES = [
+    "motor",
+    "f-12",
+    "415v",
+    "crusher",
+    "qqqq",
+    "ac",
+    "11kv motor",
+    "\"battery charger\"",
+    "feeder:f-1",
+    "voltage:11kv pump",
+    "breaker:acb spare",
+    "description:\"lighting db\" 63a",
+    "rating:400..800",
+    "rating>=1250a spare",
+]
+
+# Words typed one key at a time, so later keystrokes refine earlier results
+TYPED = ["transformer", "compressor 6.6kv"]
+
+# Best rows kept for display, as on the unit screens
+TOP_K = 100
+
+# Slowdowns above this ratio are marked in --compare output
+REGRESSION_RATIO = 1.10
+
+
+def percentile(samples, fraction):
+    """Return the nearest-rank percentile of a non-empty list of samples."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def summarize(samples_ms):
+    return {
+        "p50_ms": percentile(samples_ms, 0.50),
+        "p90_ms": percentile(samples_ms, 0.90),
+        "p99_ms": percentile(samples_ms, 0.99),
+        "mean_ms": sum(samples_ms) / len(samples_ms),
+        "samples": len(samples_ms),
+    }
+
+
+def timed(phases, name, func, *args):
+    """Run func(*args), record its wall time in milliseconds under name and return its result."""
+    start = time.perf_counter()
+    result = func(*args)
+    phases[name] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def parse_json(json_file):
+    with open(json_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def remove_derived_files(json_file):
+    for suffix in (".idx.json", ".tables.json", ".db"):
+        path = dataset_path(json_file, suffix)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def load_store(backend, json_file, phases):
+    """Open json_file from scratch with backend, timing each step into phases."""
+    remove_derived_files(json_file)
+    if backend == "memory":
+        data = timed(phases, "parse_ms", parse_json, json_file)
+        store = timed(phases, "build_ms", MemoryStore, data)
+    else:
+        index_file = dataset_path(json_file, ".idx.json")
+        timed(phases, "index_ms", IndexedJsonStore.write_index, json_file, index_file)
+        store = timed(phases, "open_ms", IndexedJsonStore.open, json_file, index_file)
+        if backend in ("json", "packed"):
+            timed(phases, "build_ms", store.search_structures)
+        else:
+            db_file = dataset_path(json_file, ".db")
+            timed(phases, "build_ms", SqliteStore.ingest, store, db_file, json_file)
+            store = timed(phases, "open_db_ms", SqliteStore.open, db_file, json_file)
+    timed(phases, "headers_ms", store.headers)
+    return store
+
+
+def packed_copy(json_file):
+    """Return the path of a packed copy of json_file, writing it if needed."""
+    packed_file = dataset_path(json_file, ".packed.json")
+    if not os.path.exists(packed_file):
+        pack_dataset(json_file, packed_file, build_table_index(json_file))
+    return packed_file
+
+
+def run_query(store, text):
+    results = store.query(Query(text))
+    results.ranked(TOP_K)
+    return results
+
+
+def bench_queries(store, repeat):
+    queries = {}
+    all_samples = []
+    for text in QUERIES:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results = run_query(store, text)
+            samples.append((time.perf_counter() - start) * 1000)
+        queries[text] = dict(summarize(samples), rows=results.row_count())
+        all_samples.extend(samples)
+    return queries, summarize(all_samples)
+
+
+def bench_typing(store, repeat):
+    """Time every keystroke of TYPED, refining the previous result where the screen would."""
+    samples = []
+    for _ in range(repeat):
+        for text in TYPED:
+            previous = None
+            for end in range(1, len(text) + 1):
+                term = text[:end]
+                start = time.perf_counter()
+                if previous is not None and previous.can_refine(store, term):
+                    previous = previous.refine(term)
+                else:
+                    previous = store.query(Query(term))
+                previous.ranked(TOP_K)
+                samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes everywhere but macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_case(spec):
+    """Benchmark one (dataset, backend) pair in this process and return its result."""
+    json_file, backend, repeat = spec["path"], spec["backend"], spec["repeat"]
+    phases = {}
+    store = load_store(backend, json_file, phases)
+    queries, latency = bench_queries(store, repeat)
+    typing = bench_typing(store, max(1, repeat // 4))
+    del store
+    gc.collect()
+
+    # Traced separately: tracemalloc slows allocation-heavy code several times over
+    tracemalloc.start()
+    store = load_store(backend, json_file, {})
+    for text in QUERIES:
+        run_query(store, text)
+    traced_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "phases": phases,
+        "query_latency": latency,
+        "typing_latency": typing,
+        "queries": queries,
+        "peak_traced_bytes": traced_peak,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def run_case_process(spec):
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.datalayer", "--case", json.dumps(spec)],
+        cwd=REPO_ROOT, stdout=subprocess.PIPE, check=True, universal_newlines=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, check=True, universal_newlines=True).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT,
+            stdout=subprocess.PIPE, check=True, universal_newlines=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def case_key(case):
+    return f"{case['shape']}/{case['rows']}/{case['backend']}"
+
+
+def flatten_metrics(case):
+    metrics = dict(case["phases"])
+    for name in ("query_latency", "typing_latency"):
+        for stat in ("p50_ms", "p90_ms", "p99_ms"):
+            metrics[f"{name}.{stat}"] = case[name][stat]
+    metrics["peak_traced_bytes"] = case["peak_traced_bytes"]
+    if case["peak_rss_bytes"] is not None:
+        metrics["peak_rss_bytes"] = case["peak_rss_bytes"]
+    return metrics
+
+
+def compare(report, baseline, file=sys.stdout):
+    """Print every metric of report next to the same metric in baseline."""
+    base_cases = {case_key(case): case for case in baseline["cases"] if "phases" in case}
+    print(f"Compared with {baseline['meta'].get('commit') or 'unknown commit'}:", file=file)
+    for case in report["cases"]:
+        key = case_key(case)
+        if "phases" not in case or key not in base_cases:
+            continue
+        old_metrics = flatten_metrics(base_cases[key])
+        for name, value in flatten_metrics(case).items():
+            old = old_metrics.get(name)
+            if not old:
+                continue
+            ratio = value / old
+            flag = "  <-- slower" if ratio > REGRESSION_RATIO else ""
+            print(f"  {key:24} {name:24} {old:14.1f} -> {value:14.1f}  x{ratio:.2f}{flag}", file=file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default="10000,100000",
+                        help="comma-separated dataset sizes in rows")
+    parser.add_argument("--shapes", default="dict,list", help="comma-separated row shapes: dict, list")
+    parser.add_argument("--backends", default=",".join(BACKENDS),
+                        help="comma-separated storage backends: " + ", ".join(BACKENDS))
+    parser.add_argument("--repeat", type=int, default=20, help="runs of each query")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", help="keep generated datasets here instead of a temporary directory")
+    parser.add_argument("--out", help="write results to this JSON file instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="results of an earlier run to compare with")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case))))
+        return
+
+    commit, dirty = git_revision()
+    report = {
+        "meta": {
+            "commit": commit,
+            "dirty": dirty,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "top_k": TOP_K,
+        },
+        "cases": [],
+    }
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_dir = args.data_dir or temp_dir
+        os.makedirs(data_dir, exist_ok=True)
+        for shape in args.shapes.split(","):
+            for rows in [int(n) for n in args.rows.split(",")]:
+                json_file = os.path.join(data_dir, f"synthetic_{shape}_{rows}_{args.seed}.json")
+                if not os.path.exists(json_file):
+                    write_dataset(json_file, rows, shape, args.seed)
+                for backend in args.backends.split(","):
+                    path = packed_copy(json_file) if backend == "packed" else json_file
+                    case = {"shape": shape, "rows": rows, "backend": backend,
+                            "file_bytes": os.path.getsize(path)}
+                    if backend == "sqlite" and not SqliteStore.available():
+                        case["skipped"] = "sqlite3 without FTS5 trigram support"
+                    else:
+                        print(f"{case_key(case)} ...", file=sys.stderr)
+                        case.update(run_case_process({"path": path, "backend": backend, "repeat": args.repeat}))
+                    report["cases"].append(case)
+                    if path != json_file:
+                        remove_derived_files(path)
+                remove_derived_files(json_file)
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            # Kept off stdout when the results themselves are printed there
+            compare(report, json.load(f), sys.stdout if args.out else sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
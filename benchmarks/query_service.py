@@ -0,0 +1,226 @@
+"""Load-test query_server.py with concurrent keep-alive clients.
+
+Starts the server on synthetic unit datasets (or targets a running one with
+--url), then for each concurrency level sends a mix of searches and table
+pages and measures throughput, latency and time to first byte of the
+streamed search responses, plus how many searches the server coalesced:
+
+    python -m benchmarks.query_service --clients 1,8,32 --out service.json
+    python -m benchmarks.query_service --url http://tablet-3:8642 --clients 4
+
+Results are JSON in the same layout as benchmarks.datalayer.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import quote, urlsplit
+
+from benchmarks.datalayer import QUERIES, REPO_ROOT, git_revision, summarize
+from benchmarks.synthetic import write_dataset
+from engine import UNITS
+
+# Share of requests that page through a table instead of searching
+TABLE_SHARE = 0.2
+
+
+class Client:
+    """One keep-alive HTTP/1.1 connection issuing GET requests."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def get(self, target):
+        """Return (status, body, seconds to first body byte, seconds in total)."""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        start = time.perf_counter()
+        self.writer.write(f"GET {target} HTTP/1.1\r\nHost: {self.host}\r\n\r\n".encode('latin-1'))
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = (await self.reader.readline()).decode('latin-1')
+            if line in ("\r\n", ""):
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        first_byte = None
+        if headers.get("transfer-encoding") == "chunked":
+            parts = []
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                if first_byte is None:
+                    first_byte = time.perf_counter() - start
+                parts.append(await self.reader.readexactly(size + 2))
+                if not size:
+                    break
+            body = b"".join(part[:-2] for part in parts)
+        else:
+            body = await self.reader.readexactly(int(headers.get("content-length", 0)))
+            first_byte = time.perf_counter() - start
+        return status, body, first_byte, time.perf_counter() - start
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def search_target(rng):
+    # Mostly tag lookups, as from a dashboard, with the benchmark query mix
+    text = f"f-{rng.randint(1, 400)}" if rng.random() < 0.7 else rng.choice(QUERIES)
+    return f"/search?q={quote(text)}&top_k=20"
+
+
+async def fetch(host, port, target):
+    client = Client(host, port)
+    try:
+        _, body, _, _ = await client.get(target)
+    finally:
+        client.close()
+    return body
+
+
+async def fetch_json(host, port, target):
+    return json.loads(await fetch(host, port, target))
+
+
+async def fetch_json_lines(host, port, target):
+    return [json.loads(line) for line in (await fetch(host, port, target)).splitlines() if line]
+
+
+async def run_level(host, port, clients, requests, seed):
+    """Send requests spread over clients concurrent connections and return the measurements."""
+    rng = random.Random(seed)
+    units = await fetch_json(host, port, "/units")
+    tables = {}
+    for unit in units:
+        lines = await fetch_json_lines(host, port, f"/search?q={quote(QUERIES[0])}&unit={unit['unit']}&top_k=50")
+        tables[unit["unit"]] = [line["table"] for line in lines if "table" in line]
+
+    targets = []
+    for _ in range(requests):
+        unit = rng.choice(units)["unit"]
+        if rng.random() < TABLE_SHARE and tables.get(unit):
+            targets.append(f"/table?unit={unit}&key={quote(rng.choice(tables[unit]))}&count=100")
+        else:
+            targets.append(search_target(rng))
+
+    before = await fetch_json(host, port, "/stats")
+    latencies, first_bytes, errors = [], [], 0
+    queue = iter(targets)
+
+    async def worker():
+        nonlocal errors
+        client = Client(host, port)
+        try:
+            for target in queue:
+                status, _, first_byte, total = await client.get(target)
+                if status != 200:
+                    errors += 1
+                latencies.append(total * 1000)
+                if target.startswith("/search"):
+                    first_bytes.append(first_byte * 1000)
+        finally:
+            client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    after = await fetch_json(host, port, "/stats")
+
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed,
+        "latency": summarize(latencies),
+        "search_first_byte": summarize(first_bytes) if first_bytes else None,
+        "searches_run": after["searches"] - before["searches"],
+        "searches_coalesced": after["coalesced"] - before["coalesced"],
+    }
+
+
+def start_server(data_dir, units):
+    """Start query_server.py on a free port and return (process, host, port)."""
+    command = [sys.executable, "query_server.py", "--data-dir", data_dir, "--host", "127.0.0.1", "--port", "0"]
+    for name in units:
+        command += ["--unit", name]
+    server = subprocess.Popen(command, cwd=REPO_ROOT, stderr=subprocess.PIPE, universal_newlines=True)
+    for line in server.stderr:
+        match = re.search(r"http://([\d.]+):(\d+)", line)
+        if match:
+            # Keep draining stderr so the server never blocks writing to it
+            threading.Thread(target=server.stderr.read, daemon=True).start()
+            return server, match.group(1), int(match.group(2))
+    raise RuntimeError("query_server.py exited before serving")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="benchmark a running server instead of starting one")
+    parser.add_argument("--units", type=int, default=2, help="synthetic units served")
+    parser.add_argument("--rows", type=int, default=20000, help="rows in each synthetic unit")
+    parser.add_argument("--clients", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=500, help="requests per concurrency level")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write results to this JSON file instead of stdout")
+    args = parser.parse_args(argv)
+
+    commit, dirty = git_revision()
+    report = {
+        "meta": {
+            "commit": commit,
+            "dirty": dirty,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "url": args.url,
+            "units": None if args.url else args.units,
+            "rows": None if args.url else args.rows,
+            "seed": args.seed,
+        },
+        "levels": [],
+    }
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        server = None
+        if args.url:
+            url = urlsplit(args.url)
+            host, port = url.hostname, url.port or 80
+        else:
+            names = list(UNITS)[:args.units]
+            for i, name in enumerate(names):
+                write_dataset(os.path.join(data_dir, UNITS[name][1]), args.rows, ("dict", "list")[i % 2], args.seed + i)
+            server, host, port = start_server(data_dir, names)
+        try:
+            for level, clients in enumerate(int(n) for n in args.clients.split(",")):
+                print(f"{clients} clients ...", file=sys.stderr)
+                report["levels"].append(asyncio.run(run_level(host, port, clients, args.requests, args.seed + level)))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Generate synthetic unit datasets for the data-layer benchmarks.
+
+The files have the same {"tables": {key: {"header", "table"}}} layout as the
+published unit data, with switchgear-like cells so that searches hit, miss
+and filter the way they do on real data. Rows are either dicts keyed by
+column name or lists under a header row, e.g.
+
+    python -m benchmarks.synthetic --rows 100000 --shape list out.json
+"""
+import argparse
+import json
+import random
+
+COLUMNS = ["Feeder", "Description", "Panel", "Voltage", "Rating", "Breaker", "Cable", "Remarks"]
+
+EQUIPMENT = ["Motor", "Transformer", "Heater", "Pump", "Fan", "Compressor", "Lighting DB", "UPS",
+             "Battery Charger", "Conveyor", "Crusher", "Mill", "Feeder Pillar", "Capacitor Bank"]
+AREAS = ["Boiler", "Turbine", "CHP", "AHP", "Water Treatment", "Switchyard", "ESP", "Cooling Tower",
+         "Compressor House", "Fuel Oil", "Admin Building"]
+VOLTAGES = ["415V", "240V", "110V DC", "220V DC", "3.3kV", "6.6kV", "11kV"]
+BREAKERS = ["ACB", "MCCB", "VCB", "SFU", "MPCB", "Contactor"]
+REMARKS = ["", "", "", "Spare", "Standby", "Under maintenance", "Interlocked with DG", "Not in use"]
+
+
+def table_header(rng, unit, table_number):
+    return f"{rng.choice(AREAS)} {rng.choice(['MCC', 'PMCC', 'Switchboard', 'DB'])}-{table_number} ({unit})"
+
+
+def row_values(rng, panel, row_number):
+    equipment = rng.choice(EQUIPMENT)
+    return [
+        f"F-{row_number}",
+        f"{equipment} {rng.randint(1, 12)}{rng.choice('ABCD')}",
+        panel,
+        rng.choice(VOLTAGES),
+        f"{rng.choice([16, 32, 63, 100, 125, 250, 400, 630, 800, 1250, 2000])}A",
+        rng.choice(BREAKERS),
+        f"{rng.choice([1, 2, 3, 4])}Rx{rng.choice([3.5, 4])}Cx{rng.choice([16, 25, 35, 70, 95, 185, 300])}sqmm",
+        rng.choice(REMARKS),
+    ]
+
+
+def generate(rows, shape="dict", rows_per_table=(20, 400), seed=0, unit="Unit 9"):
+    """Return a dataset of about `rows` rows split over tables of random size.
+
+    shape is "dict" for rows keyed by column name or "list" for rows under a
+    header row (which is not counted in `rows`). The same arguments always
+    produce the same dataset.
+    """
+    if shape not in ("dict", "list"):
+        raise ValueError(f"Unknown row shape {shape!r}")
+    rng = random.Random(seed)
+    tables = {}
+    remaining = rows
+    table_number = 0
+    while remaining > 0:
+        table_number += 1
+        count = min(remaining, rng.randint(*rows_per_table))
+        remaining -= count
+        header = table_header(rng, unit, table_number)
+        panel = header.split(" (")[0]
+        body = [row_values(rng, panel, n + 1) for n in range(count)]
+        if shape == "dict":
+            body = [dict(zip(COLUMNS, values)) for values in body]
+        else:
+            body.insert(0, list(COLUMNS))
+        tables[f"table_{table_number}"] = {"header": header, "table": body}
+    return {"tables": tables, "last_updated": "2024-01-01 00:00:00"}
+
+
+def write_dataset(path, rows, shape="dict", seed=0):
+    """Write a generated dataset to path as UTF-8 JSON."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(generate(rows, shape, seed=seed), f, ensure_ascii=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--shape", choices=["dict", "list"], default="dict")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    write_dataset(args.path, args.rows, args.shape, args.seed)
+
+
+if __name__ == '__main__':
+    main()
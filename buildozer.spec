@@ -28,7 +28,7 @@ source.include_patterns = android/app/src/main/AndroidManifest.xml
 #source.exclude_exts = spec
 
 # (list) List of directory to exclude (leave empty to not exclude anything)
-#source.exclude_dirs = tests, bin, venv
+source.exclude_dirs = benchmarks,tests
 
 # (list) List of exclusions using pattern matching
 # Do not prefix with './'
@@ -43,7 +43,7 @@ version = 0.1
 
 # (list) Application requirements
 # comma separated e.g. requirements = sqlite3,kivy
-requirements = python3,kivy==2.1.0,pillow,requests,uuid,datetime,urllib3,chardet,idna,android,openssl
+requirements = python3,kivy==2.1.0,pillow,requests,uuid,datetime,urllib3,chardet,idna,android,openssl,sqlite3
 
 # (str) Custom source folders for requirements
 # Sets custom source for any requirements with recipes
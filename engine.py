@@ -0,0 +1,116 @@
+"""Search engine over the cached unit datasets, shared by the screens and search_units.py.
+
+Nothing here imports Kivy: a DatasetSearch opens one unit's cached file and
+runs queries against it the way a unit screen does, through the same query
+cache and refinement of the previous result.
+"""
+import json
+
+from dataset import MemoryStore, QueryCache, Query, dataset_path, file_fingerprint, open_dataset
+
+# Screen name -> (launcher label, cached data file, source URL) for every unit
+UNITS = {
+    'unit3': ("Unit 3 Data", "unit3.json",
+              "https://raw.githubusercontent.com/manoj5176/swgrdetails/main/data/processed_pdf_data.json"),
+    'unit4': ("Unit 4 Data", "unit4.json",
+              "https://raw.githubusercontent.com/manoj5176/swgrdetails/main/data/processed_pdf_data1.json"),
+    'unit5': ("Unit 5 Data", "unit5.json",
+              "https://raw.githubusercontent.com/manoj5176/swgrdetails/main/data/processed_pdf_data2.json"),
+    'unit6': ("Unit 6 Data", "unit6.json",
+              "https://raw.githubusercontent.com/manoj5176/swgrdetails/main/data/processed_pdf_data3.json"),
+    'unit7': ("offsite-data", "unit7.json",
+              "https://raw.githubusercontent.com/manoj5176/swgrdetails/main/data/processed_pdf_data4.json"),
+}
+
+def normalize_term(text):
+    """Return search box text the way searches match it: trimmed and lower-cased."""
+    return text.strip().lower()
+
+def ranked_matches(results, top_k):
+    """Return the top_k best rows of a SearchResult as JSON-ready dicts, best table first.
+
+    Rows are lists of cells in the order of "columns", whose inferred types
+    are in "types". Tables matched only by their header are listed without
+    rows.
+    """
+    row_matched = {table_key for table_key, _, _, _, matches, _ in results.tables if matches}
+    return [
+        {"table": table_key,
+         "header": header,
+         "header_match": header_matches,
+         "columns": list(rows.columns),
+         "types": list(rows.types),
+         "rows": [list(row) for row in rows] if table_key in row_matched else []}
+        for table_key, header, rows, header_matches in results.ranked(top_k)]
+
+class DatasetSearch:
+    """One unit's open dataset with its query cache and last result.
+
+    search() may run on any thread while load() replaces the dataset; each
+    search uses the store and version that were current when it started.
+    """
+
+    def __init__(self, json_file, cache_entries=64, cache_bytes=8 * 1024 * 1024):
+        self.json_file = json_file
+        self.meta_file = dataset_path(json_file, ".meta.json")
+        self.query_cache = QueryCache(cache_entries, cache_bytes)
+        self.last_search = None
+        # (store, version), replaced as a whole so searches never mix two datasets
+        self.dataset = (MemoryStore(), None)
+
+    @property
+    def store(self):
+        return self.dataset[0]
+
+    @property
+    def version(self):
+        return self.dataset[1]
+
+    def load(self, storage_backend="json"):
+        """(Re)open the cached file, dropping cached results; False if it was never downloaded."""
+        store = open_dataset(self.json_file, storage_backend)
+        self.query_cache.clear()
+        self.last_search = None
+        if store is None:
+            return False
+        self.dataset = (store, self._version(store))
+        return True
+
+    def is_stale(self):
+        """Whether the cached file changed (or first appeared) since it was loaded."""
+        source = getattr(self.store, "source", None)
+        try:
+            return source != file_fingerprint(self.json_file)
+        except OSError:
+            return False
+
+    def _version(self, store):
+        """Identify the installed dataset by its download hash, else by file fingerprint"""
+        try:
+            with open(self.meta_file, 'r') as f:
+                digest = json.load(f).get("sha256")
+            if digest:
+                return digest
+        except Exception:
+            pass
+        return getattr(store, "source", None) or file_fingerprint(self.json_file)
+
+    def search(self, term, cancelled=None):
+        """Return (SearchResult, source) for term, where source is "cache", "refine" or "query".
+
+        Raises SearchCancelled once cancelled() is true.
+        """
+        term = normalize_term(term)
+        store, version = self.dataset
+        previous = self.last_search
+        results = self.query_cache.get(version, term)
+        if results is not None:
+            source = "cache"
+        elif previous is not None and previous.can_refine(store, term):
+            results, source = previous.refine(term, cancelled), "refine"
+        else:
+            results, source = store.query(Query(term), cancelled), "query"
+        if source != "cache":
+            self.query_cache.put(version, term, results)
+        self.last_search = results
+        return results, source
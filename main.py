@@ -1,24 +1,37 @@
+import time
+_startup_began = time.perf_counter()
+
 from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
 from kivy.uix.label import Label
 from kivy.uix.screenmanager import ScreenManager, Screen, NoTransition
 from kivy.metrics import dp
-from kivy.properties import StringProperty, NumericProperty, ObjectProperty
+from kivy.properties import StringProperty, NumericProperty, ObjectProperty, ListProperty, BooleanProperty
 from kivy.uix.textinput import TextInput
 from kivy.uix.scrollview import ScrollView
 from kivy.uix.gridlayout import GridLayout
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleview import views as recycle_views
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
 from kivy.graphics import Color, Rectangle
 from kivy.clock import Clock
 from kivy.uix.modalview import ModalView
+from kivy.factory import Factory
 from functools import partial
-import requests
-import json
+from itertools import islice, chain
+from bisect import bisect_right
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import os
 from kivy.logger import Logger
 from kivy.core.window import Window
 import threading
+from dataset import DatasetUpdater, SearchCancelled, SearchResult
+from engine import UNITS, DatasetSearch, normalize_term
+from tracing import spans
 
 class AutoSizeLabel(Label):
     def __init__(self, **kwargs):
@@ -52,29 +65,489 @@ class AutoSizeLabel1(Label):
     def _adjust_height(self, instance, texture_size):
         self.height = texture_size[1] + dp(10)
 
+class WidgetPool:
+    """Bounded free list of widgets of one kind, rebound to new data instead of recreated.
+
+    acquire() hands out a pooled widget, or a new one from factory when the
+    pool is empty; release() takes back a widget that has been removed from
+    its parent, keeping at most max_size of them.
+    """
+
+    def __init__(self, factory, max_size=400):
+        self.factory = factory
+        self.max_size = max_size
+        self.created = 0
+        self.reused = 0
+        self._free = []
+
+    def __len__(self):
+        return len(self._free)
+
+    def acquire(self):
+        if self._free:
+            self.reused += 1
+            return self._free.pop()
+        self.created += 1
+        return self.factory()
+
+    def release(self, widget):
+        if len(self._free) < self.max_size:
+            self._free.append(widget)
+
+# Cell labels shared by every TableRow in every list
+cell_pool = WidgetPool(AutoSizeLabel)
+
+def set_widget_pool_sizes(max_views, max_cells):
+    """Cap the widgets kept for reuse: RecycleView row views (Kivy's own
+    cache, shared by every list) and the TableRow cell labels."""
+    recycle_views._max_cache_size = max_views
+    cell_pool.max_size = max_cells
+    del cell_pool._free[max_cells:]
+
+def park_views(recycle_view):
+    """Empty a hidden list so its views go back to the shared cache for other lists.
+
+    Returns what restore_views needs to show the same data again.
+    """
+    parked = recycle_view.data, recycle_view.scroll_y
+    recycle_view.data = []
+    return parked
+
+def restore_views(recycle_view, parked):
+    """Show data emptied by park_views again, unless the list was refilled meanwhile."""
+    if parked is None or recycle_view.data:
+        return
+    data, scroll_y = parked
+    recycle_view.data = data
+    Clock.schedule_once(lambda dt: setattr(recycle_view, 'scroll_y', scroll_y))
+
+class TableRow(RecycleDataViewBehavior, GridLayout):
+    """Recycled view for one table row.
+
+    The view reuses its cell labels when it is rebound to another row and
+    sizes itself to the tallest wrapped cell, so the RecycleView only keeps
+    widgets for the rows in the viewport.
+    """
+    row = ObjectProperty(None, allownone=True)
+    row_source = ObjectProperty(None, allownone=True)
+    row_index = NumericProperty(0)
+    header = BooleanProperty(False)
+    row_color = ListProperty([0.95, 0.95, 0.95, 1])
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.size_hint_y = None
+        self.spacing = dp(2)
+        self.padding = (0, dp(1))
+
+        with self.canvas.before:
+            self.bg_color = Color(*self.row_color)
+            self.bg = Rectangle(pos=self.pos, size=self.size)
+
+        self.bind(pos=self._update_bg, size=self._update_bg)
+
+    def _update_bg(self, *args):
+        self.bg.pos = self.pos
+        self.bg.size = self.size
+
+    def refresh_view_attrs(self, rv, index, data):
+        super().refresh_view_attrs(rv, index, data)
+        values = self.row_source[self.row_index] if self.row_source is not None else self.row
+
+        labels = self.children[::-1]
+        for label in labels[len(values):]:
+            label.unbind(height=self._update_height)
+            self.remove_widget(label)
+            cell_pool.release(label)
+        del labels[len(values):]
+        while len(labels) < len(values):
+            label = cell_pool.acquire()
+            label.bind(height=self._update_height)
+            self.add_widget(label)
+            labels.append(label)
+
+        self.cols = max(1, len(values))
+        for label, value in zip(labels, values):
+            label.text = str(value) if value is not None else ""
+            label.color = (1, 1, 1, 1) if self.header else (0, 0, 0, 1)
+            label.bold = self.header
+            label.font_size = dp(14) if self.header else dp(12)
+            label.halign = 'left' if self.header else 'center'
+
+        self.bg_color.rgba = self.row_color
+        self._update_height()
+
+    def _update_height(self, *args):
+        self.height = max([dp(40)] + [label.height for label in self.children])
+
+class LoadMoreButton(Button):
+    """Last row of a paged RecycleView list; pressing it loads the next page."""
+    callback = ObjectProperty(None, allownone=True)
+
+    def on_press(self):
+        if self.callback:
+            self.callback()
+
+Factory.register('LoadMoreButton', cls=LoadMoreButton)
+
+def build_recycle_list(**layout_kwargs):
+    """Return a (RecycleView, RecycleBoxLayout) pair for a list of TableRow items.
+
+    Items may name another viewclass under the 'viewclass' key, and rows
+    without a 'height' size themselves.
+    """
+    recycle_view = RecycleView(bar_width=dp(8), scroll_type=['bars', 'content'])
+    layout = RecycleBoxLayout(
+        orientation='vertical',
+        size_hint_y=None,
+        default_size=(None, None),
+        default_size_hint=(1, None),
+        initial_size=(Window.width, dp(40)),
+        **layout_kwargs)
+    layout.bind(minimum_height=layout.setter('height'))
+    recycle_view.add_widget(layout)
+    recycle_view.viewclass = TableRow
+    recycle_view.key_viewclass = 'viewclass'
+    return recycle_view, layout
+
+def label_item(text, color, font_size='15sp', markup=False, bold=False):
+    """Return a RecycleView data item for a single Label row."""
+    return {
+        'viewclass': 'Label',
+        'text': text,
+        'markup': markup,
+        'height': dp(40),
+        'color': color,
+        'bold': bold,
+        'halign': 'left',
+        'valign': 'middle',
+        'font_size': font_size}
+
+def row_items(table_data):
+    """Yield RecycleView data items for the column names and body rows of a Table.
+
+    Body items only reference their row by index, so rows are read when they
+    scroll into view.
+    """
+    yield {
+        'row': table_data.columns,
+        'row_source': None,
+        'row_index': 0,
+        'header': True,
+        'row_color': (0.3, 0.5, 0.7, 1)}
+    for i in range(len(table_data)):
+        yield {
+            'row': None,
+            'row_source': table_data,
+            'row_index': i,
+            'header': False,
+            'row_color': (0.95, 0.95, 0.95, 1) if i % 2 == 0 else (0.85, 0.85, 0.85, 1)}
+
+def result_items(results):
+    """Yield RecycleView data items for search results, one section per table."""
+    for table_key, header, table_data, is_header_match in results:
+        yield label_item(
+            f"[b]{table_key}: {header}[/b]",
+            (0.2, 0.4, 0.6, 1),
+            markup=True,
+            bold=True)
+        
+        if table_data:
+            try:
+                items = row_items(table_data)
+                yield next(items)
+            except Exception as e:
+                yield label_item(f"Error displaying table data: {str(e)}", (0.8, 0.2, 0.2, 1))
+                continue
+            yield from items
+
+class PagedList:
+    """Feeds a RecycleView from queued item iterators, one page at a time.
+
+    The next page is added when the list is scrolled to the bottom or its
+    trailing 'Load more results' row is pressed.
+    """
+
+    def __init__(self, recycle_view, page_size=50):
+        self.view = recycle_view
+        self.page_size = page_size
+        self._sources = deque()
+        self._load_more_trigger = Clock.create_trigger(self.load_more)
+        recycle_view.bind(scroll_y=self._on_scroll)
+
+    @property
+    def pending(self):
+        return bool(self._sources)
+
+    def set_items(self, items):
+        """Replace the list with fixed items and drop anything still queued."""
+        self._sources.clear()
+        self.view.data = list(items)
+
+    def append(self, items):
+        """Queue more items, showing them now if nothing is waiting ahead of them."""
+        waiting = self.pending
+        self._sources.append(iter(items))
+        if not waiting:
+            self.load_more()
+
+    def load_more(self, *args):
+        if not self._sources:
+            return
+        
+        page = []
+        while self._sources and len(page) < self.page_size:
+            wanted = self.page_size - len(page)
+            taken = list(islice(self._sources[0], wanted))
+            page.extend(taken)
+            if len(taken) < wanted:
+                self._sources.popleft()
+        
+        data = self.view.data
+        if data and data[-1].get('viewclass') == 'LoadMoreButton':
+            data.pop()
+        data.extend(page)
+        
+        if self._sources:
+            data.append({
+                'viewclass': 'LoadMoreButton',
+                'text': "Load more results",
+                'callback': self.load_more,
+                'height': dp(40),
+                'background_normal': '',
+                'background_color': (0.3, 0.5, 0.7, 1)})
+
+    def _on_scroll(self, instance, scroll_y):
+        if scroll_y <= 0.05 and self._sources:
+            self._load_more_trigger()
+
+class StartupTimer:
+    """Records how long each startup phase took and logs them together."""
+
+    def __init__(self, began):
+        self.began = self.last = began
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self):
+        phases = ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in self.phases)
+        Logger.info(f"Startup: {phases}; total {(self.last - self.began) * 1000:.0f} ms")
+
+startup_timer = StartupTimer(_startup_began)
+
+class FrameTimes:
+    """Rolling window of frame intervals, sampled from the Clock while started."""
+    # Upper bounds of the histogram buckets; slower frames share the last bucket
+    BUCKETS_MS = (17, 33, 50, 100, 250)
+
+    def __init__(self, frames=300):
+        self.samples = deque(maxlen=frames)
+        self._event = None
+
+    def start(self):
+        if self._event is None:
+            self.samples.clear()
+            self._event = Clock.schedule_interval(self._sample, 0)
+
+    def stop(self):
+        if self._event is not None:
+            self._event.cancel()
+            self._event = None
+
+    def _sample(self, dt):
+        self.samples.append(dt * 1000)
+
+    def histogram(self):
+        """Return (label, frame count) for every bucket."""
+        counts = [0] * (len(self.BUCKETS_MS) + 1)
+        for ms in self.samples:
+            counts[bisect_right(self.BUCKETS_MS, ms)] += 1
+        labels = [f"<{bound} ms" for bound in self.BUCKETS_MS] + [f">={self.BUCKETS_MS[-1]} ms"]
+        return list(zip(labels, counts))
+
+class DebugOverlay(Label):
+    """Translucent panel showing the latest timing spans and a frame-time histogram.
+
+    It takes no touches, so the screen underneath stays usable while it is shown.
+    """
+    shown_spans = 12
+
+    def __init__(self, **kwargs):
+        super().__init__(
+            font_name='RobotoMono-Regular',
+            font_size=dp(10),
+            color=(1, 1, 1, 1),
+            halign='left',
+            valign='top',
+            size_hint=(1, 0.5),
+            pos_hint={'x': 0, 'top': 1},
+            **kwargs)
+        self.frames = FrameTimes()
+        self._refresh_event = None
+        with self.canvas.before:
+            Color(0, 0, 0, 0.75)
+            self.bg = Rectangle(pos=self.pos, size=self.size)
+        self.bind(pos=self._update_bg, size=self._update_bg)
+
+    def _update_bg(self, *args):
+        self.bg.pos = self.pos
+        self.bg.size = self.size
+        self.text_size = (self.width - dp(10), self.height - dp(10))
+
+    def show(self, parent):
+        parent.add_widget(self)
+        self.frames.start()
+        self.refresh()
+        self._refresh_event = Clock.schedule_interval(self.refresh, 0.5)
+
+    def hide(self):
+        self.frames.stop()
+        if self._refresh_event is not None:
+            self._refresh_event.cancel()
+            self._refresh_event = None
+        if self.parent:
+            self.parent.remove_widget(self)
+
+    def refresh(self, *args):
+        lines = []
+        samples = sorted(self.frames.samples)
+        if samples:
+            lines.append(f"Frames (last {len(samples)}): median {samples[len(samples) // 2]:.1f} ms, "
+                         f"worst {samples[-1]:.1f} ms")
+            histogram = self.frames.histogram()
+            most = max(count for _, count in histogram)
+            for label, count in histogram:
+                lines.append(f"{label:>9} {'#' * round(20 * count / most):<20} {count}")
+        
+        lines.append("")
+        lines.append("Spans, newest first:")
+        for span in spans.last(self.shown_spans):
+            fields = " ".join(
+                f"{key}={value}" for key, value in span.items() if key not in ("time", "span", "ms", "thread"))
+            started = time.strftime("%H:%M:%S", time.localtime(span["time"]))
+            lines.append(f"{started} {span['span']:<8} {span['ms']:>8.1f} ms  {fields}")
+        self.text = "\n".join(lines)
+
+def lower_thread_priority():
+    """Lower the calling thread's scheduling priority where the OS allows it (Linux/Android)."""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+    except (AttributeError, OSError):
+        pass
+
 class MainApp(App):
+    # Refresh every unit's dataset in the background shortly after startup
+    prefetch_on_start = True
+    prefetch_workers = 2
+    prefetch_delay = 2
+    # Widgets kept for reuse by every list: row views, and table cell labels
+    max_pooled_views = 300
+    max_pooled_cells = 600
+    # Open table screens kept before the least recently used are closed
+    max_table_screens = 8
+    max_table_rows = 20000
+    
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.nav_history = []
         self.first_run = True
+        self.prefetches = {}
+        # json_file -> the DatasetSearch shared by its unit screen and the global search
+        self.engines = {}
 
     def build(self):
+        try:
+            spans.open_log(os.path.join(self.user_data_dir, "spans.jsonl"))
+        except OSError as e:
+            # Spans are still kept in memory for the debug overlay
+            Logger.warning(f"Span log unavailable: {str(e)}")
+        set_widget_pool_sizes(self.max_pooled_views, self.max_pooled_cells)
         self.sm = ScreenManager()
+        self.table_screens = TableScreenCache(self.sm, self.max_table_screens, self.max_table_rows)
         self.sm.bind(current=self.on_screen_change)
         
         launcher_screen = LauncherScreen(name='launcher')
         self.sm.add_widget(launcher_screen)
         
+        startup_timer.mark("build")
+        Window.bind(on_flip=self._on_first_frame)
         return self.sm
 
+    def _on_first_frame(self, *args):
+        Window.unbind(on_flip=self._on_first_frame)
+        startup_timer.mark("first frame")
+        startup_timer.report()
+
     def on_start(self):
         if self.first_run:
             self.first_run = False
             current_screen = self.sm.current_screen
             if hasattr(current_screen, 'check_and_load_data'):
                 current_screen.check_and_load_data()
+            if self.prefetch_on_start:
+                Clock.schedule_once(lambda dt: self.prefetch_units(), self.prefetch_delay)
+
+    def prefetch_units(self):
+        """Update every unit's cached dataset concurrently on low-priority threads"""
+        executor = ThreadPoolExecutor(
+            max_workers=self.prefetch_workers,
+            thread_name_prefix="prefetch",
+            initializer=lower_thread_priority)
+        for name, (label, json_file, url) in UNITS.items():
+            updater = DatasetUpdater(
+                json_file, url, BaseAppScreen.storage_backend.defaultvalue,
+                compress_cache=BaseAppScreen.compress_cache,
+                download_variant=BaseAppScreen.download_variant)
+            future = executor.submit(updater.update, os.path.exists(json_file))
+            self.prefetches[json_file] = future
+            future.add_done_callback(
+                lambda f, name=name: Clock.schedule_once(lambda dt: self._prefetch_done(name, f)))
+        executor.shutdown(wait=False)
+
+    def engine(self, json_file):
+        """Return the one DatasetSearch of json_file, so each dataset is held in memory once"""
+        engine = self.engines.get(json_file)
+        if engine is None:
+            engine = self.engines[json_file] = DatasetSearch(
+                json_file, BaseAppScreen.query_cache_entries, BaseAppScreen.query_cache_bytes)
+        return engine
+
+    def pending_prefetch(self, json_file):
+        """Return the running prefetch of json_file, if any"""
+        future = self.prefetches.get(json_file)
+        return future if future is not None and not future.done() else None
+
+    def _prefetch_done(self, name, future):
+        try:
+            result = future.result()
+        except Exception as e:
+            Logger.warning(f"Prefetch of {name} failed: {str(e)}")
+            result = e
+        
+        if not self.sm.has_screen(name):
+            return
+        screen = self.sm.get_screen(name)
+        if screen.awaiting_prefetch:
+            screen.awaiting_prefetch = False
+            if isinstance(result, Exception) and not os.path.exists(screen.json_file):
+                screen.update_data()
+            else:
+                # Loads the previous file if the prefetch failed
+                screen._update_complete()
+        elif isinstance(result, Exception):
+            return
+        elif not len(screen.store) and screen.loading_modal is None:
+            # Opened while the file could not be read, e.g. before its first download finished
+            screen._update_complete()
+        elif result is not None:
+            screen._update_complete(*result)
 
     def on_screen_change(self, instance, screen_name):
+        self.table_screens.touch(screen_name)
         if screen_name not in self.nav_history and screen_name != 'launcher':
             self.nav_history.append(screen_name)
         
@@ -98,6 +571,25 @@ class LauncherScreen(Screen):
             color=(0.2, 0.2, 0.6, 1))
         layout.add_widget(title)
         
+        search_box = BoxLayout(size_hint_y=None, height=dp(50), spacing=dp(5))
+        self.search_input = TextInput(
+            hint_text="Search all units...",
+            multiline=False,
+            padding=[dp(15), dp(10)],
+            font_size=dp(14),
+            size_hint_x=0.7)
+        self.search_input.bind(on_text_validate=self.search_all_units)
+        search_all_btn = Button(
+            text="Search all",
+            size_hint_x=0.3,
+            font_size=dp(14),
+            background_normal='',
+            background_color=(0.3, 0.5, 0.7, 1))
+        search_all_btn.bind(on_press=self.search_all_units)
+        search_box.add_widget(self.search_input)
+        search_box.add_widget(search_all_btn)
+        layout.add_widget(search_box)
+        
         unit3_btn = Button(
             text="Unit 3 Data",
             size_hint_y=None,
@@ -165,6 +657,17 @@ class LauncherScreen(Screen):
         
         self.add_widget(layout)
     
+    def search_all_units(self, instance):
+        search_term = normalize_term(self.search_input.text)
+        if not search_term:
+            return
+        
+        app = App.get_running_app()
+        if not app.sm.has_screen('global_search'):
+            app.sm.add_widget(GlobalSearchScreen(name='global_search'))
+        app.sm.get_screen('global_search').search(search_term)
+        app.sm.current = 'global_search'
+    
     def launch_unit3(self, instance):
         app = App.get_running_app()
         if not app.sm.has_screen('unit3'):
@@ -201,19 +704,50 @@ class BaseAppScreen(Screen):
     github_data_url = StringProperty("")
     last_updated = StringProperty("Never")
     search_results_count = NumericProperty(0)
+    results_page_size = 50
+    # Best-matching rows shown per search
+    query_top_k = 100
+    query_cache_entries = 64
+    query_cache_bytes = 8 * 1024 * 1024
+    download_chunk_size = 64 * 1024
+    # Keep the cached file gzip-packed table by table; tables are inflated as they are opened
+    compress_cache = True
+    # Pre-compressed copy of the data file to try first (".gz" or ".xz"), for hosts publishing one
+    download_variant = None
+    storage_backend = StringProperty("json")
     
     def __init__(self, json_file, **kwargs):
         super().__init__(**kwargs)
         self.json_file = json_file
-        self.data = {"tables": {}, "last_updated": "Never"}
+        app = App.get_running_app()
+        if app is not None:
+            self.engine = app.engine(json_file)
+        else:
+            self.engine = DatasetSearch(json_file, self.query_cache_entries, self.query_cache_bytes)
+        self.search_generation = 0
         self.build_ui()
         self._search_trigger = Clock.create_trigger(self._perform_search, 0.5)
         self._first_update_done = False
+        self.awaiting_prefetch = False
+        self._parked_results = None
         self.loading_modal = None
+        self.debug_overlay = None
+    
+    @property
+    def store(self):
+        return self.engine.store
     
     def check_and_load_data(self):
         """Check if JSON exists, download if not, load if exists"""
-        if not os.path.exists(self.json_file):
+        app = App.get_running_app()
+        if app and app.pending_prefetch(self.json_file):
+            # Opening the file now would wait on the UI thread for the update to finish
+            Logger.info(f"Waiting for the prefetch of {self.json_file}")
+            self.awaiting_prefetch = True
+            self.status_label.text = "Updating..."
+            self.show_loading("Downloading data..." if not os.path.exists(self.json_file)
+                              else "Updating data...")
+        elif not os.path.exists(self.json_file):
             Logger.info(f"JSON file not found at {self.json_file}, downloading...")
             self.update_data()  # This will trigger the download
         else:
@@ -242,29 +776,37 @@ class BaseAppScreen(Screen):
             self.show_error(f"Update failed: {str(e)}")
 
     def _download_and_update(self):
-        """Download data from GitHub and update local file"""
+        """Bring the cached file up to date and refresh the screen from it"""
         try:
-            Logger.info(f"Downloading data from {self.github_data_url}")
-            response = requests.get(self.github_data_url, timeout=10)
-            response.raise_for_status()
-            new_data = response.json()
-
-            # Create directory if it doesn't exist
-            os.makedirs(os.path.dirname(self.json_file), exist_ok=True)
-            
-            with open(self.json_file, 'w') as f:
-                json.dump(new_data, f)
-            
-            Clock.schedule_once(lambda dt: self._update_complete())
+            result = self.updater().update(bool(len(self.store)))
         except Exception as e:
             Logger.error(f"Download failed: {str(e)}")
-            Clock.schedule_once(lambda dt: self._update_failed(str(e)))
+            Clock.schedule_once(lambda dt, error=str(e): self._update_failed(error))
+            return
+        
+        if result is None:
+            Clock.schedule_once(lambda dt: self._update_not_modified())
+        else:
+            Clock.schedule_once(lambda dt: self._update_complete(*result))
+
+    def updater(self):
+        return DatasetUpdater(
+            self.json_file, self.github_data_url, self.storage_backend, self.download_chunk_size,
+            self.compress_cache, self.download_variant)
 
-    def _update_complete(self):
-        """Called when download and save completes successfully"""
+    def _update_complete(self, changed=None, removed=()):
+        """Called when download and save completes successfully
+        
+        changed is the set of table keys a delta update replaced; None means
+        the whole file was downloaded.
+        """
         try:
             self.load_data()
-            self.load_headers_list()
+            if changed is None:
+                self.load_headers_list()
+            else:
+                self.refresh_headers(changed)
+            self.refresh_table_screens(changed, removed)
             self.status_label.text = f"Last updated: {self.last_updated}"
             Logger.info("Data update completed successfully")
         except Exception as e:
@@ -273,6 +815,35 @@ class BaseAppScreen(Screen):
         finally:
             self.dismiss_loading()
 
+    def _update_not_modified(self):
+        """Called when the server reports the cached data is current"""
+        checked = datetime.now().strftime("%H:%M:%S")
+        self.status_label.text = f"Already up to date (checked {checked})"
+        self.dismiss_loading()
+
+    def on_pre_enter(self):
+        restore_views(self.results_view, self._parked_results)
+        self._parked_results = None
+    
+    def on_leave(self):
+        self._parked_results = park_views(self.results_view)
+        if self.debug_overlay is not None:
+            self.debug_overlay.hide()
+    
+    def toggle_debug_overlay(self):
+        """Show or hide the timing overlay; a triple tap on the screen title does this"""
+        if self.debug_overlay is None:
+            self.debug_overlay = DebugOverlay()
+        if self.debug_overlay.parent:
+            self.debug_overlay.hide()
+        else:
+            self.debug_overlay.show(self)
+    
+    def _on_title_touch(self, label, touch):
+        if label.collide_point(*touch.pos) and touch.is_triple_tap:
+            self.toggle_debug_overlay()
+            return True
+    
     def on_enter(self):
         """Called when screen becomes visible"""
         if not hasattr(self, '_initial_load_done'):
@@ -280,22 +851,14 @@ class BaseAppScreen(Screen):
             Clock.schedule_once(lambda dt: self.check_and_load_data(), 0.5)
     
     def load_data(self):
+        """Open the dataset from the cached file, unless the global search already has it open"""
         try:
-            if os.path.exists(self.json_file):
-                with open(self.json_file, 'r') as f:
-                    self.data = json.load(f)
-                    self.last_updated = self.data.get("last_updated", "Never")
-                    self.status_label.text = f"Last updated: {self.last_updated}"
+            if (len(self.store) and not self.engine.is_stale()) or self.engine.load(self.storage_backend):
+                self.last_updated = self.store.last_updated
+                self.status_label.text = f"Last updated: {self.last_updated}"
         except Exception as e:
             Logger.error(f"Error loading JSON: {str(e)}")
     
-    def save_data(self):
-        try:
-            with open(self.json_file, 'w') as f:
-                json.dump(self.data, f)
-        except Exception as e:
-            Logger.error(f"Error saving JSON: {str(e)}")
-    
     def build_ui(self):
         self.main_layout = BoxLayout(orientation='vertical')
         
@@ -324,6 +887,7 @@ class BaseAppScreen(Screen):
             text_size=(Window.width * 0.55, None),
             shorten=True,
             shorten_from='right')
+        self.title_label.bind(on_touch_down=self._on_title_touch)
         
         self.status_label = Label(
             text=f"Last updated: {self.last_updated}",
@@ -342,7 +906,7 @@ class BaseAppScreen(Screen):
         # Search Area
         search_box = BoxLayout(size_hint_y=None, height=dp(50), spacing=dp(5))
         self.search_input = TextInput(
-            hint_text="Search...",
+            hint_text="Search, e.g. feeder:F-12 415V",
             multiline=False,
             padding=[dp(15), dp(10)],
             font_size=dp(14),
@@ -417,15 +981,11 @@ class BaseAppScreen(Screen):
 
         # Results screen
         self.results_screen = Screen(name='results')
-        self.results_scroll = ScrollView(bar_width=dp(8))
-        self.results_list = GridLayout(
-            cols=1,
-            size_hint_y=None,
+        self.results_view, self.results_list = build_recycle_list(
             spacing=dp(5),
             padding=dp(5))
-        self.results_list.bind(minimum_height=self.results_list.setter('height'))
-        self.results_scroll.add_widget(self.results_list)
-        self.results_screen.add_widget(self.results_scroll)
+        self.results_pager = PagedList(self.results_view, self.results_page_size)
+        self.results_screen.add_widget(self.results_view)
         self.content_manager.add_widget(self.results_screen)
         
         self.content_manager.current = 'headers'
@@ -441,34 +1001,62 @@ class BaseAppScreen(Screen):
         self.status_label.texture_update()
     
     def load_headers_list(self, *args):
-        self.headers_layout.clear_widgets()
+        with spans.span("headers", unit=self.name) as span:
+            self.headers_layout.clear_widgets()
+            
+            for table_key, header in self.store.headers():
+                btn = Button(
+                    text=f" {header}",
+                    size_hint_y=None,
+                    height=dp(40),
+                    background_normal='',
+                    background_color=(0.8, 0.8, 0.9, 1),
+                    color=(0, 0, 0, 1))
+                btn.table_key = table_key
+                btn.header_text = header
+                btn.bind(on_press=self.on_header_click)
+                self.headers_layout.add_widget(btn)
+            span["widgets"] = len(self.headers_layout.children)
+    
+    def refresh_headers(self, changed):
+        """Relabel the buttons of changed tables; rebuild the list only if tables moved"""
+        buttons = list(reversed(self.headers_layout.children))
+        headers = self.store.headers()
+        if [btn.table_key for btn in buttons] != [table_key for table_key, _ in headers]:
+            self.load_headers_list()
+            return
         
-        for table_key, table_data in self.data.get("tables", {}).items():
-            header = table_data.get("header", "")
-            btn = Button(
-                text=f" {header}",
-                size_hint_y=None,
-                height=dp(40),
-                background_normal='',
-                background_color=(0.8, 0.8, 0.9, 1),
-                color=(0, 0, 0, 1))
-            btn.table_key = table_key
-            btn.header_text = header
-            btn.bind(on_press=self.on_header_click)
-            self.headers_layout.add_widget(btn)
+        for btn, (table_key, header) in zip(buttons, headers):
+            if table_key in changed:
+                btn.text = f" {header}"
+                btn.header_text = header
     
-    def on_header_click(self, instance):
-        table_data = self.data.get("tables", {}).get(instance.table_key, {}).get("table", [])
+    def refresh_table_screens(self, changed=None, removed=()):
+        """Reload the open table screens of changed tables (all if None) and close removed ones"""
+        if not self.manager:
+            return
         
-        if instance.table_key in self.manager.screen_names:
-            self.manager.current = instance.table_key
-        else:
+        headers = dict(self.store.headers())
+        for screen in list(self.manager.screens):
+            if not isinstance(screen, TableViewScreen) or screen.unit_name != self.name:
+                continue
+            if screen.table_key in removed or screen.table_key not in headers:
+                if self.manager.current == screen.name:
+                    screen.go_back(None)
+                self.manager.remove_widget(screen)
+            elif changed is None or screen.table_key in changed:
+                screen.set_table(headers[screen.table_key], self.store.table(screen.table_key))
+    
+    def on_header_click(self, instance):
+        def build():
             table_screen = TableViewScreen(
                 instance.table_key,
                 instance.header_text,
-                table_data)
-            self.manager.add_widget(table_screen)
-            self.manager.current = instance.table_key
+                self.store.table(instance.table_key))
+            table_screen.unit_name = self.name
+            return table_screen
+        
+        App.get_running_app().table_screens.show(instance.table_key, build)
     
     def show_headers_list(self, instance):
         self.clear_search(instance)
@@ -477,12 +1065,13 @@ class BaseAppScreen(Screen):
     def clear_search(self, instance):
         self.search_input.text = ""
         self.content_manager.current = 'headers'
-        self.results_list.clear_widgets()
+        self.search_generation += 1
+        self.results_pager.set_items([])
         self.results_count_label.text = ""
         self.search_results_count = 0
     
     def do_search(self, instance):
-        search_term = self.search_input.text.strip().lower()
+        search_term = normalize_term(self.search_input.text)
         if not search_term:
             self.clear_search(instance)
             return
@@ -490,202 +1079,80 @@ class BaseAppScreen(Screen):
         self._search_trigger()
     
     def _perform_search(self, *args):
-        search_term = self.search_input.text.strip().lower()
+        search_term = normalize_term(self.search_input.text)
         
-        self.results_list.clear_widgets()
-        loading = BoxLayout(orientation='vertical', size_hint_y=None, height=dp(40))
-        loading.add_widget(Label(text="Searching...", color=(0.3, 0.5, 0.7, 1)))
-        self.results_list.add_widget(loading)
+        self.results_pager.set_items([label_item("Searching...", (0.3, 0.5, 0.7, 1))])
         self.content_manager.current = 'results'
         
         try:
-            self.search_term = search_term
             self.search_results_count = 0
-            self.all_data = self.data.get("tables", {})
-            self.current_search_index = 0
+            self.search_generation += 1
 
-            threading.Thread(target=self._threaded_search, daemon=True).start()
+            threading.Thread(
+                target=self._threaded_search,
+                args=(self.search_generation, search_term),
+                daemon=True).start()
         except Exception as e:
             Logger.error(f"Search error: {str(e)}")
-            self.results_list.clear_widgets()
-            error = Label(text=f"Search error: {str(e)}", color=(0.8, 0.2, 0.2, 1))
-            self.results_list.add_widget(error)
+            self.results_pager.set_items([label_item(f"Search error: {str(e)}", (0.8, 0.2, 0.2, 1))])
     
-    def _threaded_search(self):
-        results = []
+    def _threaded_search(self, generation, search_term):
+        cancelled = lambda: generation != self.search_generation
+        error = None
+        try:
+            with spans.span("search", unit=self.name, term=search_term) as span:
+                results, span["source"] = self.engine.search(search_term, cancelled)
+                span["tables"] = len(results)
+                span["rows"] = results.row_count()
+                span["cache"] = self.engine.query_cache.stats()
+            if span["source"] == "cache":
+                Logger.debug(f"Query cache hit for '{search_term}': {span['cache']}")
+            if cancelled():
+                return
+            # Scoring every match of a broad search takes longer than a frame
+            with spans.span("rank", unit=self.name, top_k=self.query_top_k):
+                ranked = results.ranked(self.query_top_k)
+        except SearchCancelled:
+            return
+        except Exception as e:
+            Logger.error(f"Search error: {str(e)}")
+            results, ranked, error = [], [], str(e)
         
-        for table_key, table_data in self.all_data.items():
-            header = table_data.get("header", "")
-            table_content = table_data.get("table", [])
-            
-            header_matches = self.search_term in header.lower()
-            table_matches = []
-
-            try:
-                if isinstance(table_content, list):
-                    if table_content and isinstance(table_content[0], dict):
-                        table_matches = [
-                            row for row in table_content
-                            if any(self.search_term in str(value).lower() for value in row.values())
-                        ]
-                    elif table_content and isinstance(table_content[0], list):
-                        table_matches = [
-                            row for row in table_content
-                            if any(self.search_term in str(value).lower() for value in row)
-                        ]
-            except Exception as e:
-                Logger.error(f"Error processing table: {str(e)}")
-
-            if header_matches or table_matches:
-                results.append((table_key, header, table_matches if table_matches else table_content, header_matches))
+        Clock.schedule_once(lambda dt: self._display_search_results(results, ranked, generation, error))
+    
+    def _display_search_results(self, results, ranked, generation, error=None):
+        if generation != self.search_generation:
+            return
         
-        Clock.schedule_once(lambda dt: self._display_search_results(results))
+        if error is not None:
+            self.results_pager.set_items([label_item(f"Search error: {error}", (0.8, 0.2, 0.2, 1))])
+            self.results_count_label.text = ""
+            return
+        
+        with spans.span("display", unit=self.name) as span:
+            self._show_search_results(results, ranked)
+            span["rows"] = results.row_count() if isinstance(results, SearchResult) else 0
+            span["widgets"] = len(self.results_view.data)
     
-    def _display_search_results(self, results):
-        self.results_list.clear_widgets()
+    def _show_search_results(self, results, ranked):
+        """Show results, whose ranked() display tuples were worked out off the UI thread"""
         self.search_results_count = len(results)
         
         if not results:
-            no_results = Label(
-                text="No results found",
-                size_hint_y=None,
-                height=dp(40),
-                color=(0.8, 0.2, 0.2, 1))
-            self.results_list.add_widget(no_results)
+            self.results_pager.set_items([label_item("No results found", (0.8, 0.2, 0.2, 1))])
             self.results_count_label.text = "No results found"
             return
         
-        for table_key, header, table_data, is_header_match in results:
-            header_label = Label(
-                text=f"[b]{table_key}: {header}[/b]",
-                markup=True,
-                size_hint_y=None,
-                height=dp(40),
-                color=(0.2, 0.4, 0.6, 1),
-                bold=True,
-                halign='left',
-                valign='middle')
-            self.results_list.add_widget(header_label)
-            
-            if isinstance(table_data, list) and table_data:
-                try:
-                    if isinstance(table_data[0], dict):
-                        columns = list(table_data[0].keys())
-                        rows = table_data
-                    else:
-                        columns = table_data[0] if len(table_data) > 1 else [f"Col {i+1}" for i in range(len(table_data[0]))]
-                        rows = table_data[1:] if len(table_data) > 1 else table_data
-                    
-                    header_row = GridLayout(
-                        cols=len(columns),
-                        size_hint_y=None,
-                        spacing=dp(1),
-                        padding=(0, dp(1)))
-                    
-                    with header_row.canvas.before:
-                        Color(0.3, 0.5, 0.7, 1)
-                        header_row.bg = Rectangle(pos=header_row.pos, size=header_row.size)
-                    
-                    header_row.bind(
-                        pos=lambda i, v: setattr(header_row.bg, 'pos', i.pos),
-                        size=lambda i, v: setattr(header_row.bg, 'size', i.size))
-                    
-                    max_header_height = dp(40)
-                    for col in columns:
-                        header_cell = AutoSizeLabel(
-                            text=str(col),
-                            color=(1, 1, 1, 1),
-                            bold=True,
-                            font_size=dp(14))
-                        header_row.add_widget(header_cell)
-                        max_header_height = max(max_header_height, header_cell.height)
-                    
-                    header_row.height = max_header_height
-                    self.results_list.add_widget(header_row)
-                    
-                    for i, row in enumerate(rows):
-                        row_layout = GridLayout(
-                            cols=len(columns),
-                            size_hint_y=None,
-                            spacing=dp(1),
-                            padding=(0, dp(1)))
-                        
-                        row_color = (0.95, 0.95, 0.95, 1) if i % 2 == 0 else (0.85, 0.85, 0.85, 1)
-                        
-                        with row_layout.canvas.before:
-                            Color(*row_color)
-                            row_layout.bg = Rectangle(pos=row_layout.pos, size=row_layout.size)
-                        
-                        row_layout.bind(
-                            pos=lambda i, v: setattr(i.bg, 'pos', i.pos),
-                            size=lambda i, v: setattr(i.bg, 'size', i.size))
-                        
-                        max_cell_height = dp(40)
-                        if isinstance(row, dict):
-                            for col in columns:
-                                value = row.get(col, "")
-                                cell = AutoSizeLabel(
-                                    text=str(value) if value is not None else "",
-                                    color=(0, 0, 0, 1),
-                                    font_size=dp(12))
-                                row_layout.add_widget(cell)
-                                max_cell_height = max(max_cell_height, cell.height)
-                        else:
-                            for value in row:
-                                cell = AutoSizeLabel(
-                                    text=str(value) if value is not None else "",
-                                    color=(0, 0, 0, 1),
-                                    font_size=dp(12))
-                                row_layout.add_widget(cell)
-                                max_cell_height = max(max_cell_height, cell.height)
-                        
-                        row_layout.height = max_cell_height
-                        self.results_list.add_widget(row_layout)
-                
-                except Exception as e:
-                    error_label = Label(
-                        text=f"Error displaying table data: {str(e)}",
-                        size_hint_y=None,
-                        height=dp(40),
-                        color=(0.8, 0.2, 0.2, 1))
-                    self.results_list.add_widget(error_label)
-        
-        self.results_count_label.text = f"Results: {self.search_results_count}"
-    
-    def update_data(self, instance=None):
-        try:
-            if not self.github_data_url:
-                raise ValueError("No data URL configured")
-                
-            self.status_label.text = "Updating..."
-            self.show_loading("Updating data...")
-            
-            threading.Thread(target=self._download_and_update, daemon=True).start()
-        except Exception as e:
-            self.status_label.text = f"Update failed: {str(e)}"
-            self.show_error(f"Update failed: {str(e)}")
-    
-    def _download_and_update(self):
-        try:
-            response = requests.get(self.github_data_url, timeout=10)
-            response.raise_for_status()
-            new_data = response.json()
-
-            self.data["tables"] = new_data
-            self.data["last_updated"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            with open(self.json_file, 'w') as f:
-                json.dump(self.data, f)
-            
-            Clock.schedule_once(lambda dt: self._update_complete())
-        except Exception as e:
-            Clock.schedule_once(lambda dt: self._update_failed(str(e)))
-    
-    def _update_complete(self):
-        self.load_data()
-        self.load_headers_list()
-        self.status_label.text = f"Last updated: {self.last_updated}"
-        self.dismiss_loading()
+        self.results_pager.set_items([])
+        self.results_view.scroll_y = 1
+        if isinstance(results, SearchResult):
+            self.results_pager.append(result_items(ranked))
+            row_count = results.row_count()
+            shown = f" (best {self.query_top_k} of {row_count} rows)" if row_count > self.query_top_k else ""
+        else:
+            self.results_pager.append(result_items(results))
+            shown = ""
+        self.results_count_label.text = f"Results: {self.search_results_count}{shown}"
     
     def _update_failed(self, error):
         Logger.error(f"Update failed: {error}")
@@ -740,6 +1207,8 @@ class TableViewScreen(Screen):
         self.table_key = table_key
         self.header_text = header
         self.table_data = table_data
+        self.unit_name = None
+        self._parked_rows = None
         self.build_ui()
 
     def build_ui(self):
@@ -779,123 +1248,52 @@ class TableViewScreen(Screen):
             text_size=(Window.width - dp(100), None),
             padding=(5, 5))
         screen_header.add_widget(title)
+        self.title_label = title
         main_layout.add_widget(screen_header)
 
-        # Scrollable content
-        scroll_view = ScrollView(bar_width=dp(8))
-        self.content_layout = GridLayout(
-            cols=1,
-            size_hint_y=None,
+        # Recycled content: only the rows in the viewport get widgets
+        self.table_view, self.content_layout = build_recycle_list(
             spacing=dp(5),
             padding=[0, dp(5), 0, dp(5)])
-        self.content_layout.bind(minimum_height=self.content_layout.setter('height'))
 
         # Add table name label
-        table_name_label = Label(
-            text=f"[b]{self.table_key}[/b]",
+        self.rows_data = [label_item(
+            f"[b]{self.table_key}[/b]",
+            (0.2, 0.4, 0.6, 1),
+            font_size=dp(16),
             markup=True,
-            size_hint_y=None,
-            height=dp(40),
-            color=(0.2, 0.4, 0.6, 1),
-            bold=True,
-            halign='left',
-            valign='middle',
-            font_size=dp(16))
-        self.content_layout.add_widget(table_name_label)
+            bold=True)]
 
         # Add headers and rows
-        self.add_headers()
         self.add_rows()
 
-        scroll_view.add_widget(self.content_layout)
-        main_layout.add_widget(scroll_view)
+        self.table_view.data = self.rows_data
+        main_layout.add_widget(self.table_view)
         self.add_widget(main_layout)
 
-    def add_headers(self):
+    def add_rows(self):
         if not self.table_data:
             return
 
-        if isinstance(self.table_data[0], dict):
-            columns = list(self.table_data[0].keys())
-        else:
-            columns = self.table_data[0] if len(self.table_data) > 1 else [f"Col {i+1}" for i in range(len(self.table_data[0]))]
-
-        header_row = GridLayout(
-            cols=len(columns),
-            size_hint_y=None,
-            spacing=dp(2),
-            padding=(0, dp(1)))
-        
-        with header_row.canvas.before:
-            Color(0.3, 0.5, 0.7, 1)
-            header_row.bg = Rectangle(pos=header_row.pos, size=header_row.size)
-
-        header_row.bind(
-            pos=lambda i, v: setattr(header_row.bg, 'pos', i.pos),
-            size=lambda i, v: setattr(header_row.bg, 'size', i.size))
-
-        max_header_height = dp(40)
-        for col in columns:
-            header_cell = AutoSizeLabel1(
-                text=str(col),
-                color=(1, 1, 1, 1),
-                bold=True,
-                font_size=dp(14))
-            header_row.add_widget(header_cell)
-            max_header_height = max(max_header_height, header_cell.height)
-
-        header_row.height = max_header_height
-        self.content_layout.add_widget(header_row)
+        self.rows_data.extend(row_items(self.table_data))
 
-    def add_rows(self):
-        if not self.table_data:
-            return
+    def set_table(self, header, table_data):
+        """Show updated content for this table in place"""
+        self.header_text = header
+        self.title_label.text = header
+        self.table_data = table_data
+        self.rows_data = self.rows_data[:1]
+        self.add_rows()
+        self.table_view.data = self.rows_data
+        self._parked_rows = None
 
-        if isinstance(self.table_data[0], dict):
-            columns = list(self.table_data[0].keys())
-            rows = self.table_data
-        else:
-            columns = self.table_data[0] if len(self.table_data) > 1 else [f"Col {i+1}" for i in range(len(self.table_data[0]))]
-            rows = self.table_data[1:] if len(self.table_data) > 1 else self.table_data
-
-        for i, row in enumerate(rows):
-            row_layout = GridLayout(
-                cols=len(columns),
-                size_hint_y=None,
-                spacing=dp(2),
-                padding=(0, dp(1)))
-
-            row_color = (0.95, 0.95, 0.95, 1) if i % 2 == 0 else (0.85, 0.85, 0.85, 1)
-
-            with row_layout.canvas.before:
-                Color(*row_color)
-                row_layout.bg = Rectangle(pos=row_layout.pos, size=row_layout.size)
-
-            row_layout.bind(
-                pos=lambda i, v: setattr(i.bg, 'pos', i.pos),
-                size=lambda i, v: setattr(i.bg, 'size', i.size))
-
-            max_cell_height = dp(40)
-            if isinstance(row, dict):
-                for col in columns:
-                    value = row.get(col, "")
-                    cell = AutoSizeLabel(
-                        text=str(value) if value is not None else "",
-                        color=(0, 0, 0, 1),
-                        font_size=dp(12))
-                    row_layout.add_widget(cell)
-                    max_cell_height = max(max_cell_height, cell.height)
-            else:
-                for value in row:
-                    cell = AutoSizeLabel(
-                        text=str(value) if value is not None else "",
-                        color=(0, 0, 0, 1),
-                        font_size=dp(12))
-                    row_layout.add_widget(cell)
-                    max_cell_height = max(max_cell_height, cell.height)
+    def on_pre_enter(self):
+        restore_views(self.table_view, self._parked_rows)
+        self._parked_rows = None
 
-            row_layout.height = max_cell_height
-            self.content_layout.add_widget(row_layout)
+    def on_leave(self):
+        # Hidden tables keep their data but hand their row widgets to the shared pool
+        self._parked_rows = park_views(self.table_view)
 
     def go_back(self, instance):
         app = App.get_running_app()
@@ -913,26 +1311,215 @@ class TableViewScreen(Screen):
             elif 'launcher' in self.manager.screen_names:
                 self.manager.current = 'launcher'
 
+class TableScreenCache:
+    """Keeps the open TableViewScreens of a ScreenManager in LRU order.
+
+    Once more than max_screens are open, or their rows add up to more than
+    max_rows, the least recently shown ones (never the current screen) are
+    removed from the manager. They are rebuilt by show() when opened again;
+    go_back already skips history entries whose screen is gone.
+    """
+
+    def __init__(self, manager, max_screens=8, max_rows=20000):
+        self.manager = manager
+        self.max_screens = max_screens
+        self.max_rows = max_rows
+        self._screens = OrderedDict()
+
+    def __len__(self):
+        return len(self._screens)
+
+    def show(self, name, build):
+        """Switch to the table screen called name, building it with build() if it is not open."""
+        if not self.manager.has_screen(name):
+            self.manager.add_widget(build())
+        self._screens[name] = self.manager.get_screen(name)
+        self.manager.current = name
+        self.touch(name)
+
+    def touch(self, name):
+        """Mark name as just shown and close the screens over the limits."""
+        if name not in self._screens:
+            return
+        self._screens.move_to_end(name)
+        self.evict()
+
+    def evict(self):
+        for name, screen in list(self._screens.items()):
+            if screen.manager is not self.manager:
+                del self._screens[name]
+
+        rows = sum(len(screen.rows_data) for screen in self._screens.values())
+        for name, screen in list(self._screens.items()):
+            if len(self._screens) <= self.max_screens and rows <= self.max_rows:
+                break
+            if name == self.manager.current:
+                continue
+            Logger.debug(f"Closing table screen {name}")
+            del self._screens[name]
+            rows -= len(screen.rows_data)
+            screen.table_view.data = []
+            self.manager.remove_widget(screen)
+
+class GlobalSearchScreen(Screen):
+    """Searches every unit's dataset at once and streams results in by unit.
+
+    Each unit is searched on its own pool thread; a unit's section is added
+    as soon as its search finishes, so the total wait is about that of the
+    slowest unit rather than the sum of all of them.
+    """
+    max_workers = len(UNITS)
+    # Best-matching rows shown per unit
+    query_top_k = 20
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.generation = 0
+        self.pending_units = 0
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.build_ui()
+
+    def build_ui(self):
+        main_layout = BoxLayout(orientation='vertical', spacing=0)
+
+        screen_header = BoxLayout(
+            size_hint_y=None,
+            height=dp(50),
+            padding=[10, 5],
+            spacing=10)
+        
+        with screen_header.canvas.before:
+            Color(0.2, 0.4, 0.6, 1)
+            screen_header.bg = Rectangle(pos=screen_header.pos, size=screen_header.size)
+        
+        screen_header.bind(
+            pos=lambda i, v: setattr(screen_header.bg, 'pos', i.pos),
+            size=lambda i, v: setattr(screen_header.bg, 'size', i.size))
+        
+        back_btn = Button(
+            text="← Back",
+            size_hint_x=None,
+            width=dp(80),
+            background_normal='',
+            background_color=(0.3, 0.5, 0.7, 1),
+            color=(1, 1, 1, 1))
+        back_btn.bind(on_press=self.go_back)
+        screen_header.add_widget(back_btn)
+        
+        self.title_label = Label(
+            text="Search all units",
+            halign='left',
+            valign='middle',
+            color=(1, 1, 1, 1),
+            size_hint_x=1,
+            text_size=(Window.width - dp(100), None),
+            shorten=True)
+        screen_header.add_widget(self.title_label)
+        main_layout.add_widget(screen_header)
+
+        self.status_label = Label(
+            text="",
+            size_hint_y=None,
+            height=dp(25),
+            color=(0.3, 0.5, 0.7, 1),
+            bold=True,
+            font_size=dp(12))
+        main_layout.add_widget(self.status_label)
+
+        self.results_view, self.results_list = build_recycle_list(
+            spacing=dp(5),
+            padding=dp(5))
+        self.results_pager = PagedList(self.results_view, BaseAppScreen.results_page_size)
+        main_layout.add_widget(self.results_view)
+        self.add_widget(main_layout)
+
+    def search(self, search_term):
+        """Start searching every unit for search_term, replacing any earlier search"""
+        self.generation += 1
+        self.pending_units = len(UNITS)
+        self.title_label.text = f'All units: "{search_term}"'
+        self.status_label.text = f"Searching {len(UNITS)} units..."
+        self.results_pager.set_items([])
+        self.results_view.scroll_y = 1
+        
+        app = App.get_running_app()
+        for label, json_file, _ in UNITS.values():
+            self.executor.submit(
+                self._search_unit,
+                self.generation,
+                label,
+                app.engine(json_file),
+                search_term)
+
+    def _search_unit(self, generation, label, engine, search_term):
+        """Search one unit through the engine its screen uses, opening the dataset if nothing has yet"""
+        error = None
+        try:
+            if not len(engine.store) or engine.is_stale():
+                engine.load(BaseAppScreen.storage_backend.defaultvalue)
+            cancelled = lambda: generation != self.generation
+            results = engine.search(search_term, cancelled)[0] if len(engine.store) else None
+            # Ranked here rather than on the UI thread, as on the unit screens
+            ranked = results.ranked(self.query_top_k) if results else []
+        except SearchCancelled:
+            return
+        except Exception as e:
+            Logger.error(f"Search error in {label}: {str(e)}")
+            results, ranked, error = [], [], str(e)
+        Clock.schedule_once(lambda dt: self._unit_done(generation, label, results, ranked, error))
+
+    def _unit_done(self, generation, label, results, ranked, error):
+        if generation != self.generation:
+            return
+        
+        self.pending_units -= 1
+        if error is not None:
+            items = [label_item(f"{label}: search error: {error}", (0.8, 0.2, 0.2, 1))]
+        elif results is None:
+            items = [label_item(f"{label}: not downloaded yet", (0.5, 0.5, 0.5, 1))]
+        elif not results:
+            items = [label_item(f"{label}: no results", (0.5, 0.5, 0.5, 1))]
+        else:
+            heading = label_item(
+                f"[b]{label}: {len(results)} tables[/b]",
+                (0.2, 0.2, 0.6, 1),
+                font_size=dp(18),
+                markup=True,
+                bold=True)
+            items = chain([heading], result_items(ranked))
+        self.results_pager.append(items)
+        
+        if self.pending_units:
+            self.status_label.text = f"Searching... {len(UNITS) - self.pending_units} of {len(UNITS)} units done"
+        else:
+            self.status_label.text = f"Searched {len(UNITS)} units"
+
+    def go_back(self, instance):
+        if self.manager and 'launcher' in self.manager.screen_names:
+            self.manager.current = 'launcher'
+
 class Unit3Screen(BaseAppScreen):
     def __init__(self, **kwargs):
-        super().__init__(json_file="unit3.json", **kwargs)
-        self.github_data_url = "https://raw.githubusercontent.com/manoj5176/swgrdetails/main/data/processed_pdf_data.json"
+        super().__init__(json_file=UNITS['unit3'][1], **kwargs)
+        self.github_data_url = UNITS['unit3'][2]
 
 class Unit4Screen(BaseAppScreen):
     def __init__(self, **kwargs):
-        super().__init__(json_file="unit4.json", **kwargs)
-        self.github_data_url = "https://raw.githubusercontent.com/manoj5176/swgrdetails/main/data/processed_pdf_data1.json"
+        super().__init__(json_file=UNITS['unit4'][1], **kwargs)
+        self.github_data_url = UNITS['unit4'][2]
 class Unit5Screen(BaseAppScreen):
     def __init__(self, **kwargs):
-        super().__init__(json_file="unit5.json", **kwargs)
-        self.github_data_url = "https://raw.githubusercontent.com/manoj5176/swgrdetails/main/data/processed_pdf_data2.json"
+        super().__init__(json_file=UNITS['unit5'][1], **kwargs)
+        self.github_data_url = UNITS['unit5'][2]
 class Unit6Screen(BaseAppScreen):
     def __init__(self, **kwargs):
-        super().__init__(json_file="unit6.json", **kwargs)
-        self.github_data_url = "https://raw.githubusercontent.com/manoj5176/swgrdetails/main/data/processed_pdf_data3.json"
+        super().__init__(json_file=UNITS['unit6'][1], **kwargs)
+        self.github_data_url = UNITS['unit6'][2]
 class Unit7Screen(BaseAppScreen):
     def __init__(self, **kwargs):
-        super().__init__(json_file="unit7.json", **kwargs)
-        self.github_data_url = "https://raw.githubusercontent.com/manoj5176/swgrdetails/main/data/processed_pdf_data4.json"
+        super().__init__(json_file=UNITS['unit7'][1], **kwargs)
+        self.github_data_url = UNITS['unit7'][2]
+startup_timer.mark("import")
+
 if __name__ == "__main__":
     MainApp().run()
@@ -0,0 +1,54 @@
+"""Write the per-table hash manifest that clients use for delta updates.
+
+Run next to the published data files, e.g.
+
+    python make_manifest.py processed_pdf_data.json processed_pdf_data2.json
+
+writes processed_pdf_data.manifest.json and so on. Publish each manifest
+alongside its data file, regenerating it whenever the data changes.
+
+With --compress gz (or xz, or both) a pre-compressed copy such as
+processed_pdf_data.json.gz is written as well, for hosts that do not
+compress responses themselves; clients configured with that download
+variant fetch it instead of the plain file.
+"""
+import argparse
+import gzip
+import json
+import lzma
+import os
+import shutil
+
+from dataset import build_delta_manifest
+
+COMPRESSORS = {
+    # mtime=0 keeps the file, and so its ETag, unchanged while the data is
+    "gz": lambda path: gzip.GzipFile(path, 'wb', compresslevel=9, mtime=0),
+    "xz": lambda path: lzma.open(path, 'wb', preset=9),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", metavar="data_file")
+    parser.add_argument("--compress", action="append", choices=sorted(COMPRESSORS), default=[],
+                        help="also write a pre-compressed copy with this suffix (repeatable)")
+    args = parser.parse_args(argv)
+
+    for path in args.paths:
+        base, ext = os.path.splitext(path)
+        manifest_path = f"{base}.manifest{ext}"
+        manifest = build_delta_manifest(path)
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        print(f"{manifest_path}: {len(manifest['tables'])} tables")
+
+        for suffix in args.compress:
+            compressed_path = f"{path}.{suffix}"
+            with open(path, 'rb') as src, COMPRESSORS[suffix](compressed_path) as f:
+                shutil.copyfileobj(src, f, 1024 * 1024)
+            print(f"{compressed_path}: {os.path.getsize(compressed_path)} of {manifest['size']} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+"""Serve searches over the cached unit datasets to other devices on the LAN.
+
+Every unit's dataset is loaded once and shared by all clients. Searches use
+the app's syntax and matching (engine.DatasetSearch), so a dashboard gets
+the same rows as the unit screen:
+
+    python query_server.py --data-dir /srv/swgr --port 8642
+
+    GET /units                                     units with their table counts
+    GET /search?q=feeder:F-12+415v[&unit=unit5][&top_k=20]
+                                                   JSON lines: one per unit, then one per table
+    GET /table?unit=unit5&key=<table key>[&start=0][&count=100]
+                                                   one page of a table
+    GET /stats                                     request, coalescing and cache counters
+
+Search responses are streamed with chunked transfer encoding as each unit
+finishes. Identical searches that arrive while one is running wait for its
+result instead of running again.
+"""
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import gc
+import json
+import os
+import sys
+from urllib.parse import parse_qs, urlsplit
+
+from engine import UNITS, DatasetSearch, normalize_term, ranked_matches
+
+# Longest request line or header line accepted
+MAX_LINE = 8192
+MAX_HEADERS = 64
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class QueryService:
+    """The loaded units and the searches running over them."""
+
+    def __init__(self, units, search_workers=4, default_top_k=20, max_top_k=500):
+        # name -> (label, DatasetSearch)
+        self.units = units
+        self.default_top_k = default_top_k
+        self.max_top_k = max_top_k
+        self.executor = ThreadPoolExecutor(max_workers=search_workers, thread_name_prefix="search")
+        # (unit, term) -> Future of the running search
+        self.in_flight = {}
+        self.stats = {"requests": 0, "searches": 0, "coalesced": 0, "errors": 0}
+
+    @classmethod
+    def load(cls, data_dir, names=None, storage_backend="json", **kwargs):
+        """Open the downloaded units in data_dir, building their search indexes up front."""
+        units = {}
+        for name in names or UNITS:
+            label, json_file, _ = UNITS[name]
+            engine = DatasetSearch(
+                os.path.join(data_dir, json_file), cache_entries=1024, cache_bytes=128 * 1024 * 1024)
+            if not engine.load(storage_backend):
+                print(f"{name}: {json_file} not downloaded, skipped", file=sys.stderr)
+                continue
+            if hasattr(engine.store, "search_structures"):
+                engine.store.search_structures()
+            units[name] = (label, engine)
+        # Keep collector passes off the long-lived index objects (see search_units.py)
+        gc.collect()
+        gc.freeze()
+        return cls(units, **kwargs)
+
+    def unit_names(self, names):
+        """Check requested unit names; none requested means every unit."""
+        names = names or list(self.units)
+        for name in names:
+            if name not in self.units:
+                raise HttpError(404, f"Unknown unit {name}")
+        return names
+
+    def top_k(self, params):
+        try:
+            top_k = int(params.get("top_k", [self.default_top_k])[0])
+        except ValueError:
+            raise HttpError(400, "top_k must be a number")
+        return max(1, min(top_k, self.max_top_k))
+
+    def search(self, name, term):
+        """Return a Future of unit name's SearchResult for term, sharing one already running."""
+        key = (name, term)
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return future
+
+        self.stats["searches"] += 1
+        engine = self.units[name][1]
+        future = asyncio.get_running_loop().run_in_executor(self.executor, lambda: engine.search(term)[0])
+        self.in_flight[key] = future
+        future.add_done_callback(lambda f: self.in_flight.pop(key, None))
+        return future
+
+    def units_body(self):
+        return [
+            {"unit": name, "label": label, "tables": len(engine.store), "last_updated": engine.store.last_updated}
+            for name, (label, engine) in self.units.items()]
+
+    def table_page(self, params):
+        if "unit" not in params or "key" not in params:
+            raise HttpError(400, "unit and key are required")
+        name = self.unit_names(params["unit"][:1])[0]
+        try:
+            start = max(0, int(params.get("start", ["0"])[0]))
+            count = max(0, min(int(params.get("count", ["100"])[0]), 1000))
+        except ValueError:
+            raise HttpError(400, "start and count must be numbers")
+
+        store = self.units[name][1].store
+        table_key = params["key"][0]
+        headers = dict(store.headers())
+        if table_key not in headers:
+            raise HttpError(404, f"Unknown table {table_key}")
+        content = store.table(table_key)
+        return {
+            "unit": name,
+            "table": table_key,
+            "header": headers[table_key],
+            "columns": list(content.columns),
+            "types": list(content.types),
+            "total": len(content),
+            "start": start,
+            "rows": [list(row) for row in content[start:start + count]]}
+
+    def stats_body(self):
+        return dict(
+            self.stats,
+            in_flight=len(self.in_flight),
+            caches={name: engine.query_cache.stats() for name, (_, engine) in self.units.items()})
+
+    async def handle(self, reader, writer):
+        """Serve requests on one connection until the client closes it or asks to."""
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HttpError as e:
+                    # The rest of the stream cannot be trusted after a malformed request
+                    self.stats["errors"] += 1
+                    await send_json(writer, e.status, {"error": str(e)}, False)
+                    break
+                if request is None:
+                    break
+                method, target, headers = request
+                self.stats["requests"] += 1
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    if method != "GET":
+                        raise HttpError(405, f"{method} is not supported")
+                    await self.respond(writer, target, keep_alive)
+                except ConnectionError:
+                    raise
+                except HttpError as e:
+                    self.stats["errors"] += 1
+                    await send_json(writer, e.status, {"error": str(e)}, keep_alive)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    await send_json(writer, 500, {"error": str(e)}, keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, target, keep_alive):
+        url = urlsplit(target)
+        params = parse_qs(url.query)
+        if url.path == "/search":
+            await self.stream_search(writer, params, keep_alive)
+        elif url.path == "/table":
+            await send_json(writer, 200, self.table_page(params), keep_alive)
+        elif url.path == "/units":
+            await send_json(writer, 200, self.units_body(), keep_alive)
+        elif url.path == "/stats":
+            await send_json(writer, 200, self.stats_body(), keep_alive)
+        else:
+            raise HttpError(404, f"No such path {url.path}")
+
+    async def stream_search(self, writer, params, keep_alive):
+        term = normalize_term(params.get("q", [""])[0])
+        if not term:
+            raise HttpError(400, "q is required")
+        names = self.unit_names(params.get("unit"))
+        top_k = self.top_k(params)
+
+        async def unit_lines(name):
+            # Shielded: a client hanging up must not cancel a search others are waiting for
+            try:
+                results = await asyncio.shield(self.search(name, term))
+                # Ranking a large result takes long enough to stall other clients
+                return await asyncio.get_running_loop().run_in_executor(
+                    self.executor, result_lines, name, results, top_k)
+            except Exception as e:
+                self.stats["errors"] += 1
+                return json_lines([{"unit": name, "error": str(e)}])
+
+        # Every unit is searched at once and streamed as soon as it is done
+        start_response(writer, 200, "application/x-ndjson", keep_alive, chunked=True)
+        for done in asyncio.as_completed([unit_lines(name) for name in names]):
+            write_chunk(writer, await done)
+            await writer.drain()
+        write_chunk(writer, b"")
+        await writer.drain()
+
+
+def json_lines(lines):
+    return "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines).encode('utf-8')
+
+
+def result_lines(name, results, top_k):
+    """Encode a unit's summary line followed by one line per matching table."""
+    lines = [{"unit": name, "tables": len(results), "rows": results.row_count()}]
+    lines.extend(dict(match, unit=name) for match in ranked_matches(results, top_k))
+    return json_lines(lines)
+
+
+async def read_line(reader):
+    try:
+        line = await reader.readline()
+    except ValueError:
+        # Longer than the stream buffer
+        raise HttpError(400, "Line too long")
+    if len(line) > MAX_LINE:
+        raise HttpError(400, "Line too long")
+    return line
+
+
+async def read_request(reader):
+    """Return (method, target, headers) of the next request, or None at end of stream."""
+    line = await read_line(reader)
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode('latin-1').split()
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+
+    headers = {}
+    for _ in range(MAX_HEADERS):
+        line = await read_line(reader)
+        if line in (b"\r\n", b"\n", b""):
+            return method, target, headers
+        name, _, value = line.decode('latin-1').partition(":")
+        headers[name.strip().lower()] = value.strip()
+    raise HttpError(400, "Too many headers")
+
+
+def start_response(writer, status, content_type, keep_alive, length=None, chunked=False):
+    lines = [f"HTTP/1.1 {status} {REASONS[status]}", f"Content-Type: {content_type}"]
+    if chunked:
+        lines.append("Transfer-Encoding: chunked")
+    else:
+        lines.append(f"Content-Length: {length}")
+    lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+
+
+def write_chunk(writer, data):
+    """Write one chunk of a chunked body; empty data ends the body."""
+    writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+
+async def send_json(writer, status, body, keep_alive):
+    data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+    start_response(writer, status, "application/json", keep_alive, length=len(data))
+    writer.write(data)
+    await writer.drain()
+
+
+async def serve(service, host, port):
+    server = await asyncio.start_server(service.handle, host, port)
+    address = server.sockets[0].getsockname()
+    print(f"Serving {', '.join(service.units)} on http://{address[0]}:{address[1]}", file=sys.stderr, flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", default=".", help="directory holding unitN.json (default: current)")
+    parser.add_argument("--unit", action="append", choices=list(UNITS), help="unit to serve (default: all)")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8642)
+    parser.add_argument("--workers", type=int, default=4, help="threads running searches")
+    args = parser.parse_args(argv)
+
+    service = QueryService.load(args.data_dir, args.unit, args.backend, search_workers=args.workers)
+    if not service.units:
+        parser.error(f"no unit datasets in {args.data_dir}")
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Search the cached unit datasets from the command line.
+
+Queries use the app's search syntax and matching (see engine.py). Each
+query prints one JSON line with its best-matching rows in every unit, e.g.
+
+    python search_units.py "feeder:F-12 415v"
+    python search_units.py --batch tags.txt > matches.jsonl
+    some-producer | python search_units.py
+
+Without queries or --batch, queries are read from stdin one per line and
+each answer is printed as soon as it is found. The unitN.json files are
+looked up in --data-dir; --file searches other dataset files instead.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+
+from engine import UNITS, DatasetSearch, normalize_term, ranked_matches
+
+
+def open_units(args):
+    """Return (name, DatasetSearch) for every dataset to search."""
+    if args.file:
+        paths = [(os.path.splitext(os.path.basename(path))[0], path) for path in args.file]
+    else:
+        names = args.unit or list(UNITS)
+        paths = [(name, os.path.join(args.data_dir, UNITS[name][1])) for name in names]
+
+    units = []
+    for name, path in paths:
+        # A workstation can afford to keep far more results than the app
+        engine = DatasetSearch(path, cache_entries=4096, cache_bytes=256 * 1024 * 1024)
+        if engine.load(args.backend):
+            units.append((name, engine))
+        else:
+            print(f"{path}: not downloaded, skipped", file=sys.stderr)
+    return units
+
+
+def run_query(units, text, top_k):
+    term = normalize_term(text)
+    start = time.perf_counter()
+    found = []
+    for name, engine in units:
+        results, _ = engine.search(term)
+        if results:
+            found.append({
+                "unit": name,
+                "tables": len(results),
+                "rows": results.row_count(),
+                "matches": ranked_matches(results, top_k)})
+    return {
+        "query": term,
+        "rows": sum(unit["rows"] for unit in found),
+        "ms": round((time.perf_counter() - start) * 1000, 2),
+        "units": found}
+
+
+def queries_from(lines):
+    for line in lines:
+        if line.strip():
+            yield line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("query", nargs="*", help="queries to run; read from stdin if none")
+    parser.add_argument("--batch", metavar="FILE", help="run every non-empty line of FILE as a query")
+    parser.add_argument("--unit", action="append", choices=list(UNITS), help="unit to search (default: all)")
+    parser.add_argument("--file", action="append", help="dataset file to search instead of the units")
+    parser.add_argument("--data-dir", default=".", help="directory holding unitN.json (default: current)")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--top-k", type=int, default=20, help="best rows reported per unit")
+    args = parser.parse_args(argv)
+
+    units = open_units(args)
+    if not units:
+        parser.error("no datasets to search")
+    for _, engine in units:
+        if hasattr(engine.store, "search_structures"):
+            engine.store.search_structures()
+    # The indexes are millions of long-lived objects; without this, collector
+    # passes over them stall queries for up to a second
+    gc.collect()
+    gc.freeze()
+
+    if args.batch:
+        source = open(args.batch, 'r', encoding='utf-8')
+    elif args.query:
+        source = args.query
+    else:
+        source = sys.stdin
+
+    try:
+        for text in queries_from(source):
+            print(json.dumps(run_query(units, text, args.top_k), ensure_ascii=False), flush=source is sys.stdin)
+    finally:
+        if args.batch:
+            source.close()
+
+
+if __name__ == '__main__':
+    main()
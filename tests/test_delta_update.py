@@ -0,0 +1,207 @@
+"""Delta updates against a full download of the same data, through a local HTTP stand-in."""
+import hashlib
+import http.server
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import zlib
+
+from dataset import (
+    GZIP_MAGIC, DatasetUpdater, build_delta_manifest, build_table_index, dataset_path, open_dataset,
+)
+
+
+class DataHandler(http.server.BaseHTTPRequestHandler):
+    """Serves files from server.root with ETags and single byte ranges, like raw.githubusercontent.com."""
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get("Range")))
+        if self.server.gate is not None:
+            self.server.gate.wait(10)
+        path = os.path.join(self.server.root, self.path.lstrip("/"))
+        if not os.path.exists(path):
+            self.send_response(404)
+            self.end_headers()
+            return
+        with open(path, 'rb') as f:
+            data = f.read()
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        match = re.match(r'bytes=(\d+)-(\d+)$', self.headers.get("Range") or "")
+        if match:
+            data = data[int(match.group(1)):int(match.group(2)) + 1]
+            self.send_response(206)
+        else:
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def dataset_tables(count=12, changed=()):
+    """Tables with non-ASCII cells and both row shapes; tables in changed get an edited cell."""
+    tables = {}
+    for i in range(count):
+        rows = [{"Feeder": f"F-{i}-{n}", "Beschreibung": f"Pumpe {n} – Ünit", "Rating": f"{n * 10}A"} for n in range(30)]
+        if i % 2:
+            rows = [["Feeder", "Beschreibung", "Rating"]] + [list(row.values()) for row in rows]
+        if i in changed:
+            rows[-1] = ["F-neu", "Lüfter ✓", "63A"] if i % 2 else {"Feeder": "F-neu", "Beschreibung": "Lüfter ✓"}
+        tables[f"table_{i}"] = {"header": f"Schaltanlage {i} (Ü{i})", "table": rows}
+    return tables
+
+
+class DeltaUpdateTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), DataHandler)
+        cls.server.requests = []
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.server.root = os.path.join(self.dir, "remote")
+        self.server.gate = None
+        os.makedirs(self.server.root)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/data.json"
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def publish(self, tables, manifest=True):
+        data_file = os.path.join(self.server.root, "data.json")
+        with open(data_file, 'w', encoding='utf-8') as f:
+            json.dump(tables, f, ensure_ascii=False, indent=1)
+        if manifest:
+            with open(os.path.join(self.server.root, "data.manifest.json"), 'w', encoding='utf-8') as f:
+                json.dump(build_delta_manifest(data_file), f)
+
+    def updater(self, name, packed=False):
+        return DatasetUpdater(os.path.join(self.dir, name), self.url, compress_cache=packed)
+
+    def requests_during(self, func, *args):
+        del self.server.requests[:]
+        result = func(*args)
+        return result, list(self.server.requests)
+
+    def assert_same_dataset(self, json_file, expected_file, tables):
+        """json_file holds tables, indexed exactly as a fresh full download (expected_file) is."""
+        with open(json_file, 'rb') as f:
+            raw = f.read()
+        if raw.startswith(GZIP_MAGIC):
+            raw = _inflate_all(raw)
+        self.assertEqual(json.loads(raw.decode('utf-8'))["tables"], tables)
+
+        index = build_table_index(json_file)
+        with open(dataset_path(json_file, ".idx.json"), 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        for key in ("tables", "objects", "members"):
+            self.assertEqual(saved.get(key), index.get(key), key)
+
+        patched, full = open_dataset(json_file), open_dataset(expected_file)
+        self.assertEqual(patched.headers(), full.headers())
+        for table_key, _ in full.headers():
+            self.assertEqual(patched.table(table_key).canonical(), full.table(table_key).canonical())
+
+    def check_round_trip(self, packed):
+        self.publish(dataset_tables())
+        updater = self.updater("unit.json", packed)
+        self.assertEqual(updater.update(have_data=False), (None, ()))
+
+        # One table edited, one removed, one added and the order changed
+        tables = dataset_tables(changed={3, 8})
+        del tables["table_5"]
+        tables["table_neu"] = {"header": "Neu – ß", "table": [["Ä", "Ö"], ["1", "2"]]}
+        tables = dict(reversed(list(tables.items())))
+        self.publish(tables)
+
+        result, requests = self.requests_during(updater.update, True)
+        self.assertEqual(result, ({"table_3", "table_8", "table_neu"}, ["table_5"]))
+        self.assertEqual(sum(1 for _, byte_range in requests if byte_range), 3)
+        self.assertNotIn(("/data.json", None), requests)
+
+        full = self.updater("full.json", packed)
+        full.update(have_data=False)
+        self.assert_same_dataset(updater.json_file, full.json_file, tables)
+        with open(updater.json_file, 'rb') as f:
+            self.assertEqual(f.read(2) == GZIP_MAGIC, packed)
+
+        # Unchanged since: the manifest is revalidated and nothing is rewritten
+        self.assertIsNone(updater.update(True))
+
+    def test_delta_round_trip(self):
+        self.check_round_trip(packed=False)
+
+    def test_packed_delta_round_trip(self):
+        self.check_round_trip(packed=True)
+
+    def test_data_changed_without_manifest(self):
+        self.publish(dataset_tables())
+        updater = self.updater("unit.json")
+        updater.update(have_data=False)
+
+        result, requests = self.requests_during(updater.update, True)
+        self.assertIsNone(result)
+        self.assertEqual([path for path, _ in requests], ["/data.manifest.json", "/data.json"])
+
+        # Republished without regenerating the manifest
+        tables = dataset_tables(changed={1})
+        self.publish(tables, manifest=False)
+        self.assertEqual(updater.update(True), (None, ()))
+        with open(updater.json_file, 'r', encoding='utf-8') as f:
+            self.assertEqual(json.load(f)["tables"], tables)
+
+    def test_open_while_downloading(self):
+        self.publish(dataset_tables())
+        updater = self.updater("unit.json")
+        updater.update(have_data=False)
+        self.publish(dataset_tables(changed={2}))
+
+        # Hold the update's first request, then open the cached file meanwhile
+        self.server.gate = threading.Event()
+        del self.server.requests[:]
+        worker = threading.Thread(target=updater.update, args=(True,))
+        worker.start()
+        try:
+            while not self.server.requests:
+                time.sleep(0.01)
+            started = time.monotonic()
+            store = open_dataset(updater.json_file)
+            elapsed = time.monotonic() - started
+        finally:
+            self.server.gate.set()
+            worker.join()
+        self.assertLess(elapsed, 5)
+        self.assertEqual(len(store.headers()), 12)
+
+
+def _inflate_all(raw):
+    """Inflate every concatenated gzip member of a packed file."""
+    out = []
+    while raw:
+        inflate = zlib.decompressobj(31)
+        out.append(inflate.decompress(raw))
+        raw = inflate.unused_data
+    return b"".join(out)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,201 @@
+"""Parsing and resolving search box queries, and answering ranges over every store."""
+import json
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from dataset import (
+    MemoryStore, Query, SqliteStore, filter_names, infer_column_type, open_dataset, parse_quantity, resolve_column,
+)
+
+
+class QueryParseTest(unittest.TestCase):
+
+    def parse(self, text):
+        query = Query(text)
+        return query.terms, query.filters, [entry[:5] for entry in query.ranges]
+
+    def test_plain_term_is_simple(self):
+        query = Query("  F-12A ")
+        self.assertEqual(query.text, "f-12a")
+        self.assertEqual(query.terms, ["f-12a"])
+        self.assertTrue(query.simple)
+        self.assertFalse(Query("f-12 415v").simple)
+
+    def test_terms_phrases_and_filters(self):
+        self.assertEqual(
+            self.parse('feeder:"F 12" 415V "battery charger" panel:mcc-3'),
+            (["415v", "battery charger"], [("feeder", "f 12"), ("panel", "mcc-3")], []))
+
+    def test_time_is_a_filter_until_resolved(self):
+        self.assertEqual(self.parse("10:30"), ([], [("10", "30")], []))
+        self.assertTrue(Query("10:30").resolve({"feeder"}).simple)
+        self.assertEqual(Query("10:30").resolve({"feeder"}).terms, ["10:30"])
+        self.assertEqual(Query("10:30").resolve({"10 kv"}).filters, [({"10 kv"}, "30")])
+
+    def test_unclosed_quotes(self):
+        self.assertEqual(self.parse('"battery char'), (["battery char"], [], []))
+        self.assertEqual(self.parse('feeder:"f 12'), ([], [("feeder", "f 12")], []))
+        self.assertEqual(self.parse('motor "'), (["motor"], [], []))
+
+    def test_empty_filter_value_is_a_term(self):
+        self.assertEqual(self.parse("feeder:"), (["feeder:"], [], []))
+        self.assertEqual(self.parse('feeder:""'), (['feeder:""'], [], []))
+
+    def test_ranges(self):
+        self.assertEqual(self.parse("rating:400..800"), ([], [], [("rating", 400.0, 800.0, True, True)]))
+        self.assertEqual(self.parse("rating:..63a"), ([], [], [("rating", None, 63.0, True, True)]))
+        self.assertEqual(self.parse("voltage>=6.6kv"), ([], [], [("voltage", 6600.0, None, True, True)]))
+        self.assertEqual(self.parse("length<120"), ([], [], [("length", None, 120.0, True, False)]))
+        self.assertEqual(self.parse("load>2mw"), ([], [], [("load", 2e6, None, False, True)]))
+
+    def test_incomplete_ranges(self):
+        self.assertEqual(self.parse("x:.."), ([], [("x", "..")], []))
+        self.assertEqual(self.parse("x:abc..1"), ([], [("x", "abc..1")], []))
+        self.assertEqual(self.parse("rating>abc"), (["rating>abc"], [], []))
+        self.assertTrue(Query("rating>abc").simple)
+
+    def test_unknown_range_column_becomes_a_term(self):
+        query = Query("nosuch>5 motor").resolve({"rating", "feeder"})
+        self.assertEqual((query.terms, query.ranges), (["motor", "nosuch>5"], []))
+        query = Query("rating:1..2").resolve({"rating (a)"})
+        self.assertEqual(len(query.ranges), 1)
+
+    def test_column_names(self):
+        names = {"feeder", "rating (a)", "rating (ka)", "voltage", "voltmeter", "load (mw)", "a"}
+        self.assertEqual(resolve_column("feeder", names), {"feeder"})
+        self.assertEqual(resolve_column("a", names), {"a"})
+        self.assertEqual(resolve_column("rating", names), {"rating (a)", "rating (ka)"})
+        self.assertEqual(resolve_column("load", names), {"load (mw)"})
+        self.assertEqual(resolve_column("fe", names), {"feeder"})
+        # Ambiguous, too short, or not the start of a name
+        self.assertEqual(resolve_column("volt", names), set())
+        self.assertEqual(resolve_column("f", names - {"a"}), set())
+        self.assertEqual(resolve_column("ating", names), set())
+
+        query = Query("a:b rat>10").resolve({"feeder", "rating"})
+        self.assertEqual((query.terms, query.filters, query.ranges[0][0]), (["a:b"], [], {"rating"}))
+
+
+class QuantityTest(unittest.TestCase):
+
+    def test_electrical_units(self):
+        cases = {
+            "630": 630.0, "63 A": 63.0, "6.6kV": 6600.0, "11 kVAr": 11000.0, "2 MW": 2e6, "2mw": 2e6,
+            "1.5 MVA": 1.5e6, "12mA": 0.012, "11mv": 0.011, "50Hz": 50.0, "10 MΩ": 1e7, "5 ohm": 5.0,
+            "25%": 25.0,
+        }
+        for text, number in cases.items():
+            with self.subTest(text=text):
+                self.assertAlmostEqual(parse_quantity(text), number)
+
+    def test_other_units_are_not_quantities(self):
+        for text in ("3x185", "3.5Cx300", "500 kcmil", "10 kg", "2B", "120m", "110V DC"):
+            with self.subTest(text=text):
+                self.assertIsNone(parse_quantity(text))
+
+    def test_column_types(self):
+        self.assertEqual(infer_column_type(["3x185", "3.5Cx300", "4x95"]), "text")
+        # "1A" alone reads as an amp rating, but a column of tags does not
+        self.assertEqual(infer_column_type(["1A", "1B", "2A", "2B"]), "text")
+        self.assertEqual(infer_column_type(["16A", "63 A", "12mA"]), "rating")
+
+
+def range_dataset(seed=0):
+    """Tables with a clean Rating column and a Voltage column whose unparseable cells make it text."""
+    rng = random.Random(seed)
+    voltages = ["415V", "3.3kV", "6.6kV", "11kV", "110V DC", "220V DC", "", None, 240, 0.4]
+    tables = {}
+    for i in range(8):
+        rows = [
+            {"Feeder": f"F-{i}-{n}",
+             "Rating": rng.choice(["16A", "63 A", "400A", "630A", "800A", "1250A", 100, 2.5, "spare"]),
+             "Voltage": rng.choice(voltages),
+             "Load (MW)": rng.choice(["2 MW", "0.5MW", "750kW", "12", True])}
+            for n in range(40)]
+        if i % 2:
+            rows = [list(rows[0])] + [list(row.values()) for row in rows]
+        tables[f"t{i}"] = {"header": f"Panel {i}", "table": rows}
+    return {"last_updated": "2024-01-01 00:00:00", "tables": tables}
+
+
+def in_range(number, low, high, include_low, include_high):
+    if low is not None and (number < low or (number == low and not include_low)):
+        return False
+    return high is None or number < high or (number == high and include_high)
+
+
+class RangeQueryTest(unittest.TestCase):
+    """Ranges must select exactly the rows a scan of parse_quantity() over every cell does."""
+
+    QUERIES = [
+        "rating:400..800", "rating>=630a", "rating<100", "rating:..63", "rating:1250..",
+        "voltage>1kv", "voltage<=415", "voltage:3.3kv..11kv", "load>1mw", "load:..750kw",
+        "rating>100 voltage>1kv", "rating:400..800 feeder:f-3",
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.mkdtemp()
+        cls.json_file = os.path.join(cls.dir, "unit.json")
+        data = range_dataset()
+        with open(cls.json_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        cls.stores = {"memory": MemoryStore(data), "json": open_dataset(cls.json_file, "json")}
+        if SqliteStore.available():
+            cls.stores["sqlite"] = open_dataset(cls.json_file, "sqlite")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stores.clear()
+        shutil.rmtree(cls.dir)
+
+    def scan(self, store, text):
+        """Return {table_key: rows} of a range-only query by testing every cell."""
+        tables = [store.table(table_key) for table_key, _ in store.headers()]
+        query = Query(text).resolve({name for table in tables for name in filter_names(table.columns)})
+        found = {}
+        for (table_key, _), table in zip(store.headers(), tables):
+            names = filter_names(table.columns)
+            rows = []
+            for row in table:
+                numbers = [(name, parse_quantity(cell)) for name, cell in zip(names, row)]
+                if all(any(name in columns and number is not None and in_range(number, *bounds)
+                           for name, number in numbers)
+                       for columns, *bounds, _ in query.ranges):
+                    rows.append(list(row))
+            if rows:
+                found[table_key] = rows
+        return found
+
+    def results(self, store, text):
+        return {table_key: [list(row) for row in rows] for table_key, _, rows, _ in store.query(Query(text)).ranked(10 ** 6)}
+
+    def test_voltage_column_is_mixed(self):
+        table = self.stores["memory"].table("t0")
+        self.assertEqual(table.types[table.columns.index("Voltage")], "text")
+
+    def test_ranges_match_a_scan(self):
+        memory = self.stores["memory"]
+        for text in self.QUERIES:
+            query = Query(text)
+            for name, store in self.stores.items():
+                with self.subTest(query=text, store=name):
+                    got = self.results(store, text)
+                    if not query.filters:
+                        self.assertEqual(got, self.scan(memory, text))
+                    self.assertEqual(got, self.results(memory, text))
+        self.assertTrue(self.results(memory, "voltage>1kv"))
+
+    def test_single_letter_is_not_a_column(self):
+        for name, store in self.stores.items():
+            with self.subTest(store=name):
+                # Not a filter on "rating", whose name contains an a
+                self.assertEqual(self.results(store, "a:16"), {})
+                self.assertTrue(self.results(store, "rat:16"))
+
+
+if __name__ == '__main__':
+    unittest.main()
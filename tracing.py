@@ -0,0 +1,64 @@
+"""Timing spans for the slow paths of the app.
+
+A span times one with-block (a download, a parse, a search) and carries
+counts such as rows and widgets. The last spans are kept in memory for the
+debug overlay and, once open_log() has been called, every span is also
+appended to a rotating JSON-lines file. Nothing here imports Kivy, so the
+data layer records spans as well as the screens.
+"""
+from collections import deque
+from contextlib import contextmanager
+import json
+import logging
+from logging.handlers import RotatingFileHandler
+import threading
+import time
+
+
+class SpanLog:
+    """Recent spans in memory, each also written as a JSON line once a log file is open."""
+
+    def __init__(self, keep=100):
+        self.recent = deque(maxlen=keep)
+        # Not registered with logging, so span lines never reach the console log
+        self._logger = logging.Logger("spans", logging.INFO)
+
+    def open_log(self, path, max_bytes=256 * 1024, backups=2):
+        """Append spans to path, rotating it to path.1 .. path.<backups> at max_bytes."""
+        for handler in list(self._logger.handlers):
+            self._logger.removeHandler(handler)
+            handler.close()
+        self._logger.addHandler(RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8', delay=True))
+
+    @contextmanager
+    def span(self, name, **fields):
+        """Time the with-block as span name; fields, and any set on the yielded dict, are recorded with it."""
+        start = time.perf_counter()
+        try:
+            yield fields
+        except BaseException as e:
+            fields["error"] = type(e).__name__
+            raise
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000, fields)
+
+    def add(self, name, ms, fields):
+        record = {
+            "time": round(time.time(), 3),
+            "span": name,
+            "ms": round(ms, 2),
+            "thread": threading.current_thread().name,
+        }
+        record.update(fields)
+        self.recent.append(record)
+        if self._logger.handlers:
+            self._logger.info(json.dumps(record, default=str))
+
+    def last(self, count):
+        """Return up to count of the most recent spans, newest first."""
+        recent = list(self.recent)
+        return recent[:-count - 1:-1]
+
+
+spans = SpanLog()